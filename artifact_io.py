@@ -0,0 +1,75 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# --- Configuration ---
+EXPORT_CSV = False  # Also write a .csv copy next to every binary artifact (for spreadsheets and other tools)
+
+def _is_csv(path):
+    """
+    Returns True for artifacts stored as CSV (everything else is Feather).
+    """
+    return os.path.splitext(path)[1].lower() == '.csv'
+
+def csv_export_path(path):
+    """
+    Returns the path of the optional CSV export of an artifact.
+    """
+    return os.path.splitext(path)[0] + '.csv'
+
+def write_table(df, path, export_csv=EXPORT_CSV):
+    """
+    Writes a DataFrame artifact. '.feather' paths are written as uncompressed
+    Arrow IPC (Feather v2), which keeps the column types and can be memory-mapped
+    by readers; '.csv' paths are written as CSV.
+    """
+    if _is_csv(path):
+        df.to_csv(path, index=False)
+        return
+    feather.write_feather(df.reset_index(drop=True), path, compression='uncompressed')
+    if export_csv:
+        df.to_csv(csv_export_path(path), index=False)
+
+def read_table(path, columns=None):
+    """
+    Reads a DataFrame artifact. Feather files are memory-mapped and converted
+    one column per block, so numeric columns are read-only views of the mapped
+    file rather than parsed copies. CSV files are parsed as usual.
+    """
+    if _is_csv(path):
+        return pd.read_csv(path, usecols=columns)
+    return feather.read_table(path, columns=columns, memory_map=True).to_pandas(split_blocks=True)
+
+def read_table_chunks(path, chunk_size, columns=None):
+    """
+    Yields a DataFrame artifact in chunks of at most `chunk_size` rows.
+    """
+    if _is_csv(path):
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+        return
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    for batch in table.to_batches(max_chunksize=chunk_size):
+        yield batch.to_pandas(split_blocks=True)
+
+def write_table_chunks(chunks, path, export_csv=EXPORT_CSV):
+    """
+    Writes an iterable of DataFrame chunks (all with the same columns and dtypes)
+    as one artifact, holding a single chunk in memory at a time. Returns the row count.
+    """
+    writer, rows = None, 0
+    csv_path = path if _is_csv(path) else (csv_export_path(path) if export_csv else None)
+    try:
+        for chunk_number, chunk in enumerate(chunks):
+            if not _is_csv(path):
+                batch = pa.RecordBatch.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pa.ipc.new_file(path, batch.schema)
+                writer.write_batch(batch)
+            if csv_path is not None:
+                chunk.to_csv(csv_path, mode='w' if chunk_number == 0 else 'a', header=(chunk_number == 0), index=False)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
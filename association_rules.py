@@ -1,58 +1,270 @@
 import pandas as pd
+import numpy as np
+import sqlite3
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse import csr_matrix
 from mlxtend.preprocessing import TransactionEncoder
-from mlxtend.frequent_patterns import apriori, association_rules
+from mlxtend.frequent_patterns import fpgrowth, association_rules
 import os
 
+from rule_index import save_rules
+
 # --- Configuration ---
-INPUT_FILE = 'synthetic_transactions.csv'
+DB_NAME = 'retail_dw.db'            # Baskets come from SalesFact grouped by invoice_no
+INPUT_FILE = DB_NAME                # A .csv path (one comma-separated basket per line) is also accepted
+MIN_SUPPORT = 0.01                  # Share of baskets an itemset must appear in
+MIN_CONFIDENCE = 0.3
+MAX_ITEMSET_SIZE = 3                # Longest itemset mined (None = no limit)
+PARTITION_BY = None                 # None mines in one process; 'month' or 'country' mines partitions in parallel (SON)
+N_JOBS = os.cpu_count() or 1
+COUNT_BLOCK_ROWS = 1000            # Baskets per block when counting SON candidates (bounds pass-2 memory)
+SAVE_RULES = True                   # Persist all mined rules to the warehouse for rule_index.recommend
+
+# Distinct (basket, item) pairs; served from the covering ix_salesfact_invoice index
+BASKET_SQL = """
+SELECT DISTINCT invoice_no, product_id
+FROM SalesFact;
+"""
 
-def run_association_mining(input_file):
+# Basket partitions for SON mining; a basket belongs to the partition of its first row
+PARTITION_SQL = {
+    'month': """
+    SELECT f.invoice_no, f.product_id, printf('%04d-%02d', t.year, t.month) AS partition
+    FROM SalesFact f
+    JOIN TimeDim t ON f.time_id = t.time_id;
+    """,
+    'country': """
+    SELECT f.invoice_no, f.product_id, c.country AS partition
+    FROM SalesFact f
+    JOIN CustomerDim c ON f.customer_id = c.customer_id;
+    """,
+}
+
+def _encode_csr(basket_ids, items):
     """
-    Loads transactional data, applies Apriori algorithm, and finds association rules.
+    Returns (matrix, item_labels, basket_codes): a boolean CSR matrix with one row
+    per basket and one column per item, built from parallel arrays of basket ids
+    and items (one entry per item in a basket).
     """
-    if not os.path.exists(input_file):
-        print(f"ERROR: Transactional file not found at '{input_file}'.")
-        return
+    basket_codes, _ = pd.factorize(pd.Series(basket_ids), sort=False)
+    item_codes, item_labels = pd.factorize(pd.Series(items), sort=True)
+    matrix = csr_matrix(
+        (np.ones(len(basket_codes), dtype=bool), (basket_codes, item_codes)),
+        shape=(basket_codes.max() + 1 if len(basket_codes) else 0, len(item_labels)),
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = True
+    return matrix, [str(label) for label in item_labels], basket_codes
 
-    # 1. Load Data
+def encode_baskets(basket_ids, items):
+    """
+    Builds the sparse one-hot basket matrix (see _encode_csr) wrapped in a sparse DataFrame for mlxtend.
+    """
+    matrix, item_labels, _ = _encode_csr(basket_ids, items)
+    return pd.DataFrame.sparse.from_spmatrix(matrix, columns=item_labels)
+
+def load_baskets(conn):
+    """
+    Reads the SalesFact baskets (items = stock codes) as a sparse one-hot DataFrame.
+    """
+    pairs = pd.read_sql(BASKET_SQL, conn)
+    stock_codes = pd.read_sql("SELECT product_id, stock_code FROM ProductDim", conn).set_index('product_id')['stock_code']
+    return encode_baskets(pairs['invoice_no'].to_numpy(), pairs['product_id'].map(stock_codes).to_numpy())
+
+def load_partitioned_baskets(conn, partition_by):
+    """
+    Reads the SalesFact baskets with the partition (month or country) of each basket.
+    Returns (matrix, item_labels, partitions) where partitions[i] is the partition of basket row i.
+    """
+    if partition_by not in PARTITION_SQL:
+        raise ValueError(f"Unknown partitioning '{partition_by}'. Choose one of {tuple(PARTITION_SQL)}.")
+    rows = pd.read_sql(PARTITION_SQL[partition_by], conn)
+    rows['partition'] = rows.groupby('invoice_no', sort=False)['partition'].transform('first')
+    stock_codes = pd.read_sql("SELECT product_id, stock_code FROM ProductDim", conn).set_index('product_id')['stock_code']
+    matrix, item_labels, basket_codes = _encode_csr(rows['invoice_no'].to_numpy(), rows['product_id'].map(stock_codes).to_numpy())
+    partitions = np.empty(matrix.shape[0], dtype=object)
+    partitions[basket_codes] = rows['partition'].to_numpy()
+    return matrix, item_labels, partitions
+
+def load_baskets_from_file(input_file):
+    """
+    Reads a transactions file (one comma-separated basket per line) as a sparse one-hot DataFrame.
+    """
     with open(input_file, 'r') as f:
         # Transactions are read as a list of lists (e.g., [['milk', 'bread'], ['beer', 'diapers', 'chips']])
         transactions_raw = [line.strip().split(',') for line in f if line.strip()]
-    
-    # 2. Convert to One-Hot Encoded Format
     te = TransactionEncoder()
-    te_ary = te.fit(transactions_raw).transform(transactions_raw)
-    df_transactions = pd.DataFrame(te_ary, columns=te.columns_)
-
-    # 3. Apply Apriori Algorithm
-    print("\n--- Applying Apriori Algorithm ---")
-    frequent_itemsets = apriori(
-        df_transactions, 
-        min_support=0.2, 
-        use_colnames=True
-    )
-    print(f"Found {len(frequent_itemsets)} frequent itemsets with min_support=0.2")
+    te_ary = te.fit(transactions_raw).transform(transactions_raw, sparse=True)
+    return pd.DataFrame.sparse.from_spmatrix(te_ary, columns=te.columns_)
 
-    # 4. Generate Association Rules
-    rules = association_rules(
-        frequent_itemsets, 
-        metric="confidence", 
-        min_threshold=0.5
-    )
-    
-    # 5. Filter, Sort, and Display Top 5 Rules
-    rules = rules[['antecedents', 'consequents', 'support', 'confidence', 'lift']]
+def rules_from_itemsets(frequent_itemsets, min_confidence=MIN_CONFIDENCE):
+    """
+    Derives the association rules meeting `min_confidence` from frequent itemsets.
+    """
+    if frequent_itemsets.empty:
+        return pd.DataFrame(columns=['antecedents', 'consequents', 'support', 'confidence', 'lift'])
+    return association_rules(frequent_itemsets, metric="confidence", min_threshold=min_confidence)
+
+def mine_rules(baskets, min_support=MIN_SUPPORT, min_confidence=MIN_CONFIDENCE, max_len=MAX_ITEMSET_SIZE):
+    """
+    Mines frequent itemsets with FP-Growth (no candidate generation, works on the
+    sparse basket matrix) and derives the association rules.
+    Returns (frequent_itemsets, rules).
+    """
+    frequent_itemsets = fpgrowth(baskets, min_support=min_support, use_colnames=True, max_len=max_len)
+    return frequent_itemsets, rules_from_itemsets(frequent_itemsets, min_confidence)
+
+def _local_itemsets(matrix, min_support, max_len):
+    """
+    SON pass 1 (runs in a worker): the itemsets frequent within one partition,
+    as tuples of item column indices. Items below the support threshold in this
+    partition cannot be part of a locally frequent itemset and are dropped first;
+    fpgrowth reports positions among the kept columns, mapped back through `kept`.
+    """
+    item_counts = np.asarray(matrix.sum(axis=0)).ravel()
+    kept = np.flatnonzero(item_counts >= min_support * matrix.shape[0])
+    if len(kept) == 0:
+        return set()
+    baskets = pd.DataFrame.sparse.from_spmatrix(matrix[:, kept])
+    local = fpgrowth(baskets, min_support=min_support, use_colnames=False, max_len=max_len)
+    return {tuple(sorted(int(kept[i]) for i in itemset)) for itemset in local['itemsets']}
+
+def _count_candidates(matrix, candidate_groups):
+    """
+    SON pass 2 (runs in a worker): the number of baskets of one partition containing
+    each candidate. `candidate_groups` maps itemset size k to an items x candidates
+    indicator matrix; a basket contains a candidate when it holds all k of its items.
+    Baskets are counted COUNT_BLOCK_ROWS at a time to bound the size of the
+    basket x candidate product.
+    """
+    counts = {size: np.zeros(indicator.shape[1], dtype=np.int64) for size, indicator in candidate_groups.items()}
+    hits_matrix = matrix.astype(np.int32)
+    for start in range(0, hits_matrix.shape[0], COUNT_BLOCK_ROWS):
+        block = hits_matrix[start:start + COUNT_BLOCK_ROWS]
+        for size, indicator in candidate_groups.items():
+            hits = block @ indicator
+            counts[size] += np.bincount(hits.indices[hits.data == size], minlength=hits.shape[1])
+    return counts
+
+def son_frequent_itemsets(matrix, item_labels, partitions, min_support=MIN_SUPPORT, max_len=MAX_ITEMSET_SIZE, n_jobs=N_JOBS):
+    """
+    Finds the globally frequent itemsets with the SON algorithm: every partition is
+    mined locally (at the same relative support, so no globally frequent itemset
+    can be missed) in a process pool, then the union of the local results is
+    counted over all partitions in a second pass to keep only globally frequent ones.
+    Returns a DataFrame with 'support' and 'itemsets' columns, like fpgrowth.
+    """
+    parts = [matrix[np.flatnonzero(partitions == partition)] for partition in pd.unique(partitions)]
+    pool = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+    run = pool.map if pool is not None else map
+    try:
+        # Pass 1: candidates = itemsets frequent in at least one partition
+        candidates = sorted(set().union(*run(_local_itemsets, parts, repeat(min_support), repeat(max_len))))
+        by_size = {}
+        for candidate in candidates:
+            by_size.setdefault(len(candidate), []).append(candidate)
+        candidate_groups = {
+            size: csr_matrix((np.ones(size * len(group), dtype=np.int32),
+                              (np.concatenate(group), np.repeat(np.arange(len(group)), size))),
+                             shape=(matrix.shape[1], len(group)))
+            for size, group in by_size.items()
+        }
+
+        # Pass 2: global support of every candidate
+        totals = {size: np.zeros(len(group), dtype=np.int64) for size, group in by_size.items()}
+        for counts in run(_count_candidates, parts, repeat(candidate_groups)):
+            for size in totals:
+                totals[size] += counts[size]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    rows = []
+    for size, group in by_size.items():
+        support = totals[size] / matrix.shape[0]
+        for candidate, value in zip(group, support):
+            if value >= min_support:
+                rows.append((value, frozenset(item_labels[i] for i in candidate)))
+    return pd.DataFrame(rows, columns=['support', 'itemsets'])
+
+def _partition_rules(matrix, item_labels, min_support, min_confidence, max_len):
+    """
+    Mines the rules of one partition on its own (runs in a worker).
+    """
+    baskets = pd.DataFrame.sparse.from_spmatrix(matrix, columns=item_labels)
+    return mine_rules(baskets, min_support, min_confidence, max_len)[1]
+
+def mine_partition_rules(matrix, item_labels, partitions, min_support=MIN_SUPPORT, min_confidence=MIN_CONFIDENCE,
+                         max_len=MAX_ITEMSET_SIZE, n_jobs=N_JOBS):
+    """
+    Mines rules separately for each partition (e.g. per month or per country),
+    one partition per worker. Returns {partition: rules}.
+    """
+    names = list(pd.unique(partitions))
+    parts = [matrix[np.flatnonzero(partitions == name)] for name in names]
+    args = (parts, repeat(item_labels), repeat(min_support), repeat(min_confidence), repeat(max_len))
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            return dict(zip(names, pool.map(_partition_rules, *args)))
+    return dict(zip(names, map(_partition_rules, *args)))
+
+def run_association_mining(input_file=INPUT_FILE, min_support=MIN_SUPPORT, min_confidence=MIN_CONFIDENCE,
+                           max_len=MAX_ITEMSET_SIZE, partition_by=PARTITION_BY, n_jobs=N_JOBS, save=SAVE_RULES):
+    """
+    Loads baskets (from the warehouse, or a transactions file), applies the
+    FP-Growth algorithm, and finds association rules. With `partition_by`
+    ('month' or 'country', warehouse only) the baskets are mined partition by
+    partition across `n_jobs` processes with the SON algorithm. Rules mined from
+    the warehouse are saved back to it (AssociationRule) when `save` is set.
+    """
+    if not os.path.exists(input_file):
+        print(f"ERROR: Transactional file not found at '{input_file}'.")
+        return
+
+    # 1-2. Load Data as a Sparse One-Hot Basket Matrix, Apply FP-Growth and Generate Association Rules
+    if partition_by and input_file.endswith('.db'):
+        conn = sqlite3.connect(input_file)
+        matrix, item_labels, partitions = load_partitioned_baskets(conn, partition_by)
+        conn.close()
+        print(f"Loaded {matrix.shape[0]} baskets over {matrix.shape[1]} items "
+              f"in {len(pd.unique(partitions))} '{partition_by}' partitions.")
+        print(f"\n--- Applying FP-Growth Algorithm (SON, {n_jobs} processes) ---")
+        frequent_itemsets = son_frequent_itemsets(matrix, item_labels, partitions, min_support, max_len, n_jobs)
+        rules = rules_from_itemsets(frequent_itemsets, min_confidence)
+    else:
+        if input_file.endswith('.db'):
+            conn = sqlite3.connect(input_file)
+            baskets = load_baskets(conn)
+            conn.close()
+        else:
+            baskets = load_baskets_from_file(input_file)
+        print(f"Loaded {baskets.shape[0]} baskets over {baskets.shape[1]} items "
+              f"(density {baskets.sparse.density:.4%}).")
+        print("\n--- Applying FP-Growth Algorithm ---")
+        frequent_itemsets, rules = mine_rules(baskets, min_support, min_confidence, max_len)
+    print(f"Found {len(frequent_itemsets)} frequent itemsets with min_support={min_support}")
+
+    # Persist every rule (not just the top 5) for "also bought" lookups
+    if save and input_file.endswith('.db'):
+        conn = sqlite3.connect(input_file)
+        save_rules(conn, rules)
+        conn.commit()
+        conn.close()
+
+    # 3. Filter, Sort, and Display Top 5 Rules
+    rules = rules[['antecedents', 'consequents', 'support', 'confidence', 'lift']].copy()
     
     # Convert frozensets to strings for clean display
-    rules['antecedents'] = rules['antecedents'].apply(lambda x: ', '.join(list(x)))
-    rules['consequents'] = rules['consequents'].apply(lambda x: ', '.join(list(x)))
+    rules['antecedents'] = rules['antecedents'].apply(lambda x: ', '.join(sorted(x)))
+    rules['consequents'] = rules['consequents'].apply(lambda x: ', '.join(sorted(x)))
     
     rules_sorted = rules.sort_values(by='lift', ascending=False).head(5)
     
     print("\n--- Top 5 Association Rules (Sorted by Lift) ---")
     print(rules_sorted.to_markdown(index=False))
 
-    # 6. Analysis (Discuss one rule)
+    # 4. Analysis (Discuss one rule)
     if not rules_sorted.empty:
         top_rule = rules_sorted.iloc[0]
         print("\n--- Rule Analysis ---")
@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import time
+import numpy as np
+import pandas as pd
+
+from create_tables import create_tables, create_analytical_indexes
+from etl_process import connect_for_bulk_load, bulk_load_table, drop_indexes, rebuild_indexes
+
+# --- Configuration ---
+BENCHMARK_DB = 'benchmark_dw.db'
+ROW_COUNTS = [1_000_000, 10_000_000]
+CHUNK_ROWS = 1_000_000  # Synthetic rows are generated (and loaded) in chunks of this size
+
+def make_sales_fact_chunk(n_rows, seed):
+    """
+    Generates a synthetic SalesFact chunk shaped like the real ETL output.
+    """
+    rng = np.random.default_rng(seed)
+    quantity = rng.integers(1, 50, n_rows)
+    unit_price = rng.integers(10, 2000, n_rows) / 100
+    return pd.DataFrame({
+        'invoice_no': (536000 + rng.integers(0, 50000, n_rows)).astype(str),
+        'product_id': rng.integers(1, 4000, n_rows),
+        'customer_id': rng.integers(1, 4400, n_rows),
+        'time_id': rng.integers(1, 374, n_rows),
+        'quantity': quantity,
+        'unit_price': unit_price,
+        'sales_amount': quantity * unit_price,
+        'country': rng.choice(['United Kingdom', 'Germany', 'France', 'EIRE', 'Spain'], n_rows),
+    })
+
+def _fresh_database(db_name):
+    """
+    Removes any previous benchmark database (and its WAL files) and recreates
+    the schema with its analytical indexes.
+    """
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(db_name + suffix):
+            os.remove(db_name + suffix)
+    create_tables(db_name)
+    create_analytical_indexes(db_name)
+
+def _chunks(n_rows):
+    """
+    Yields synthetic SalesFact chunks adding up to `n_rows` rows.
+    """
+    for seed, start in enumerate(range(0, n_rows, CHUNK_ROWS)):
+        yield make_sales_fact_chunk(min(CHUNK_ROWS, n_rows - start), seed)
+
+def load_with_to_sql(db_name, n_rows):
+    """
+    The original load path: DataFrame.to_sql on a default sqlite3 connection.
+    Returns the time spent loading in seconds.
+    """
+    _fresh_database(db_name)
+    elapsed = 0.0
+    conn = sqlite3.connect(db_name)
+    for chunk in _chunks(n_rows):
+        start = time.perf_counter()
+        chunk.to_sql('SalesFact', conn, if_exists='append', index=False)
+        conn.commit()
+        elapsed += time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+def load_with_bulk_loader(db_name, n_rows, journal_mode):
+    """
+    The bulk load path: tuned pragmas, batched executemany in one explicit
+    transaction, and SalesFact indexes dropped and rebuilt around the load.
+    Returns the time spent loading in seconds.
+    """
+    _fresh_database(db_name)
+    elapsed = 0.0
+    conn = connect_for_bulk_load(db_name, journal_mode=journal_mode,
+                                 synchronous='OFF' if journal_mode == 'OFF' else 'NORMAL')
+    start = time.perf_counter()
+    conn.execute("BEGIN")
+    index_statements = drop_indexes(conn, 'SalesFact')
+    elapsed += time.perf_counter() - start
+    for chunk in _chunks(n_rows):
+        start = time.perf_counter()
+        bulk_load_table(conn, 'SalesFact', chunk)
+        elapsed += time.perf_counter() - start
+    start = time.perf_counter()
+    rebuild_indexes(conn, index_statements)
+    conn.commit()
+    elapsed += time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+def run_benchmark(row_counts, db_name=BENCHMARK_DB):
+    """
+    Loads SalesFact at each row count with the to_sql path and the bulk loader
+    (WAL and journal-off modes) and prints rows/sec for each.
+    """
+    results = []
+    for n_rows in row_counts:
+        print(f"\n--- Benchmarking SalesFact load of {n_rows:,} rows ---")
+        runs = {
+            'to_sql (default connection)': lambda: load_with_to_sql(db_name, n_rows),
+            'bulk loader (WAL)': lambda: load_with_bulk_loader(db_name, n_rows, 'WAL'),
+            'bulk loader (journal OFF)': lambda: load_with_bulk_loader(db_name, n_rows, 'OFF'),
+        }
+        for label, run in runs.items():
+            seconds = run()
+            print(f"{label}: {seconds:.2f}s")
+            results.append({'rows': n_rows, 'path': label, 'seconds': round(seconds, 2),
+                            'rows_per_sec': round(n_rows / seconds)})
+
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(db_name + suffix):
+            os.remove(db_name + suffix)
+
+    results_df = pd.DataFrame(results)
+    print("\n--- SalesFact Load Benchmark ---")
+    print(results_df.to_markdown(index=False))
+    return results_df
+
+
+if __name__ == '__main__':
+    run_benchmark(ROW_COUNTS)
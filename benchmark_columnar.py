@@ -0,0 +1,82 @@
+import os
+import time
+import pandas as pd
+
+import columnar_backend
+from olap_queries import make_query, slice_cube, run_query, PRODUCT_SEARCH_FILTER
+
+# --- Configuration ---
+DB_NAME = 'retail_dw.db'
+PARQUET_DIR = columnar_backend.PARQUET_DIR
+REPEATS = 5  # Each query is timed this many times; the median is reported
+
+# Queries that scan SalesFact directly (no aggregate table can answer them)
+FACT_SCAN_QUERIES = {
+    'RFM source scan': """
+    SELECT f.customer_id, f.sales_amount, f.invoice_no, t.date
+    FROM SalesFact f
+    JOIN TimeDim t ON f.time_id = t.time_id;
+    """,
+    'Sales per customer': "SELECT customer_id, SUM(sales_amount) AS total_sales FROM SalesFact GROUP BY customer_id;",
+    'Invoices per month': """
+    SELECT t.year, t.month, COUNT(DISTINCT f.invoice_no) AS invoices
+    FROM SalesFact f
+    JOIN TimeDim t ON f.time_id = t.time_id
+    GROUP BY t.year, t.month;
+    """,
+}
+
+# Engine queries (measures not held by the aggregates, so they go to the star schema)
+ENGINE_QUERIES = {
+    'Invoices by country/quarter': make_query(['country', 'year', 'quarter'], ['invoice_count']),
+    'UK monthly invoices': slice_cube(make_query(['year', 'month'], ['invoice_count', 'total_sales']), 'country', 'United Kingdom'),
+    "'SET' products by stock code": make_query(['stock_code'], ['total_sales'], {PRODUCT_SEARCH_FILTER: 'SET'},
+                                               order_by='total_sales DESC', limit=10),
+}
+
+def _median_ms(run):
+    """
+    Runs `run` REPEATS times and returns the median wall time in milliseconds.
+    """
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+def run_benchmark(db_name=DB_NAME, parquet_dir=PARQUET_DIR):
+    """
+    Times the same fact scans and OLAP engine queries on the SQLite warehouse
+    and on the DuckDB/Parquet backend, and prints them side by side.
+    The Parquet export is refreshed first if it is older than the warehouse.
+    """
+    columnar_backend.refresh_export(db_name, parquet_dir)
+
+    connections = {backend: columnar_backend.connect(backend, db_name, parquet_dir) for backend in columnar_backend.BACKENDS}
+    results = []
+    for name, sql in FACT_SCAN_QUERIES.items():
+        row = {'query': name}
+        for backend, conn in connections.items():
+            row[f"{backend}_ms"] = round(_median_ms(lambda: columnar_backend.read_sql(conn, sql)), 1)
+        results.append(row)
+    for name, query in ENGINE_QUERIES.items():
+        row = {'query': name}
+        for backend, conn in connections.items():
+            row[f"{backend}_ms"] = round(_median_ms(lambda: run_query(conn, query, use_cache=False)), 1)
+        results.append(row)
+    for conn in connections.values():
+        conn.close()
+
+    results_df = pd.DataFrame(results)
+    results_df['speedup'] = (results_df['sqlite_ms'] / results_df['duckdb_ms']).round(2)
+    print(f"\n--- SQLite vs DuckDB/Parquet (median of {REPEATS} runs) ---")
+    print(results_df.to_markdown(index=False))
+    return results_df
+
+
+if __name__ == '__main__':
+    if os.path.exists(DB_NAME):
+        run_benchmark()
+    else:
+        print(f"ERROR: Database '{DB_NAME}' not found. Please run the ETL script first.")
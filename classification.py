@@ -1,25 +1,33 @@
 import pandas as pd
 from sklearn.model_selection import train_test_split
-from sklearn.tree import DecisionTreeClassifier, plot_tree
+from sklearn.tree import DecisionTreeClassifier
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
-import matplotlib.pyplot as plt
 import os
 
+from reporting import render, wait_for_plots, decision_tree_plot
+from artifact_io import read_table
+from segment_scoring import save_classifiers, MODEL_FILE
+from classifier_selection import tune_classifiers, print_tuning_summary
+
 # --- Configuration ---
-INPUT_FILE = 'rfm_clusters_with_scores.csv'
+INPUT_FILE = 'rfm_clusters_with_scores.feather'
 TARGET_COLUMN = 'Cluster'
+SAVE_MODELS = True  # Persist the trained classifiers for segment_scoring.py
+TUNE_HYPERPARAMETERS = True  # Cross-validate k, metric and tree depth (False: k=1 and an unpruned tree)
 
-def perform_classification(input_file):
+def perform_classification(input_file, model_file=MODEL_FILE, save=SAVE_MODELS, tune=TUNE_HYPERPARAMETERS):
     """
     Trains Decision Tree and KNN classifiers on RFM data to predict cluster segments,
-    computes metrics, and visualizes the Decision Tree.
+    computes metrics, visualizes the Decision Tree and saves both models with their
+    feature schema to `model_file`. With `tune`, the hyperparameters are chosen by
+    cross-validation on the training split (the test split stays held out).
     """
     if not os.path.exists(input_file):
         print(f"ERROR: Input file not found at '{input_file}'. Cannot proceed with classification.")
         return
 
-    df = pd.read_csv(input_file)
+    df = read_table(input_file)
     
     # Handling small/dummy data for demonstration
     if len(df) < 5:
@@ -29,16 +37,22 @@ def perform_classification(input_file):
         test_size = 0.33
 
     features = ['recency', 'frequency', 'monetary']
-    X = df[features]
-    y = df[TARGET_COLUMN]
+    # Plain arrays: the models are served without pandas column-name checks
+    X = df[features].to_numpy(dtype=float)
+    y = df[TARGET_COLUMN].to_numpy()
 
     # Split Data (Removed 'stratify' due to tiny dummy dataset)
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=42)
 
+    best_params = {'decision_tree': {'max_depth': None}, 'knn': {'n_neighbors': 1, 'metric': 'minkowski'}}
+    if tune and len(X_train) >= 10:
+        best_params, cv_results = tune_classifiers(X_train, y_train)
+        print_tuning_summary(best_params, cv_results)
+
     results = {}
 
     # --- Model 1: Decision Tree Classifier ---
-    dt_model = DecisionTreeClassifier(random_state=42)
+    dt_model = DecisionTreeClassifier(random_state=42, **best_params['decision_tree'])
     dt_model.fit(X_train, y_train)
     y_pred_dt = dt_model.predict(X_test)
 
@@ -49,22 +63,13 @@ def perform_classification(input_file):
         'F1-Score': f1_score(y_test, y_pred_dt, average='weighted', zero_division=0),
     }
 
-    # Visualize the Decision Tree
-    plt.figure(figsize=(15, 10))
-    plot_tree(
-        dt_model, 
-        filled=True, 
-        feature_names=features, 
-        class_names=[str(c) for c in dt_model.classes_],
-        rounded=True
-    )
-    plt.title("Decision Tree Classifier for RFM Segments")
-    plt.savefig('decision_tree_visualization.png')
-    print("Decision Tree Visualization saved as 'decision_tree_visualization.png'")
+    # Visualize the Decision Tree (top levels only, rendered in the background)
+    render(decision_tree_plot, 'decision_tree_visualization.png', dt_model, features,
+           [str(c) for c in dt_model.classes_], "Decision Tree Classifier for RFM Segments")
 
     # --- Model 2: K-Nearest Neighbors (KNN) Classifier ---
-    k_neighbors = 1 
-    knn_model = KNeighborsClassifier(n_neighbors=k_neighbors)
+    k_neighbors = best_params['knn']['n_neighbors']
+    knn_model = KNeighborsClassifier(**best_params['knn'])
     knn_model.fit(X_train, y_train)
     y_pred_knn = knn_model.predict(X_test)
 
@@ -82,6 +87,11 @@ def perform_classification(input_file):
     
     best_model = results_df['Accuracy'].idxmax()
     print(f"\n--- Model Comparison ---\nBased on Accuracy, the {best_model} is better.")
+
+    if save:
+        save_classifiers({'decision_tree': dt_model, 'knn': knn_model}, features, TARGET_COLUMN,
+                         results, X_train, y_train, model_file)
+    wait_for_plots()
     
     
 if __name__ == '__main__':
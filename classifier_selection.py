@@ -0,0 +1,138 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.model_selection import StratifiedKFold, KFold
+from sklearn.neighbors import KDTree, BallTree
+from sklearn.tree import DecisionTreeClassifier
+
+# --- Configuration ---
+CV_FOLDS = 5
+KNN_K_RANGE = range(1, 31)                             # Every k is scored from one neighbor query per fold
+KNN_METRICS = ('euclidean', 'manhattan', 'chebyshev')
+TREE_DEPTHS = (2, 3, 4, 5, 6, 8, 10, 12, None)         # None = unpruned
+N_JOBS = os.cpu_count() or 1                           # Processes evaluating (fold, model) tasks
+RANDOM_STATE = 42
+
+_fold_cache = {}
+_X = None
+_y = None
+
+def fold_splits(y, n_folds=CV_FOLDS, random_state=RANDOM_STATE):
+    """
+    Returns the (train_indices, test_indices) pairs for `n_folds`-fold CV,
+    stratified when every class has at least `n_folds` members. Splits are
+    cached by the content of `y`, so repeated tuning runs reuse the same folds.
+    """
+    y = np.asarray(y)
+    key = (hashlib.sha1(y.tobytes()).hexdigest(), str(y.dtype), n_folds, random_state)
+    if key not in _fold_cache:
+        _, class_counts = np.unique(y, return_counts=True)
+        if class_counts.min() >= n_folds:
+            splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=random_state)
+        else:
+            splitter = KFold(n_splits=n_folds, shuffle=True, random_state=random_state)
+        _fold_cache[key] = list(splitter.split(np.zeros(len(y)), y))
+    return _fold_cache[key]
+
+def _init_worker(X, y):
+    """
+    Keeps the training data in each worker process, so tasks only carry fold indices.
+    """
+    global _X, _y
+    _X, _y = X, y
+
+def _knn_fold_scores(task):
+    """
+    Scores every k in `k_values` for one (fold, metric): the neighbor index is
+    built once on the fold's training rows and queried once for the largest k;
+    each smaller k votes with a prefix of the same neighbor lists.
+    """
+    fold, train_idx, test_idx, metric, k_values = task
+    classes, codes = np.unique(_y, return_inverse=True)
+    index_type = KDTree if metric in KDTree.valid_metrics else BallTree
+    index = index_type(_X[train_idx], metric=metric)
+    max_k = min(max(k_values), len(train_idx))
+    neighbor_codes = codes[train_idx][index.query(_X[test_idx], k=max_k, return_distance=False)]
+
+    rows = np.arange(len(test_idx))
+    votes = np.zeros((len(test_idx), len(classes)), dtype=np.int32)
+    scores = []
+    wanted = set(k_values)
+    for k in range(1, max_k + 1):
+        np.add.at(votes, (rows, neighbor_codes[:, k - 1]), 1)
+        if k in wanted:
+            # argmax picks the lowest class on ties, like KNeighborsClassifier
+            accuracy = float(np.mean(votes.argmax(axis=1) == codes[test_idx]))
+            scores.append(('knn', {'n_neighbors': k, 'metric': metric}, fold, accuracy))
+    return scores
+
+def _tree_fold_scores(task):
+    """
+    Scores every maximum depth in `depths` for one fold.
+    """
+    fold, train_idx, test_idx, depths, random_state = task
+    scores = []
+    for depth in depths:
+        model = DecisionTreeClassifier(max_depth=depth, random_state=random_state)
+        model.fit(_X[train_idx], _y[train_idx])
+        accuracy = float(np.mean(model.predict(_X[test_idx]) == _y[test_idx]))
+        scores.append(('decision_tree', {'max_depth': depth}, fold, accuracy))
+    return scores
+
+def _run_task(task):
+    """
+    Dispatches one (fold, model) task to its scorer.
+    """
+    return _knn_fold_scores(task[1:]) if task[0] == 'knn' else _tree_fold_scores(task[1:])
+
+def tune_classifiers(X, y, k_range=KNN_K_RANGE, metrics=KNN_METRICS, depths=TREE_DEPTHS,
+                     n_folds=CV_FOLDS, n_jobs=N_JOBS, random_state=RANDOM_STATE):
+    """
+    Cross-validates KNN (k x distance metric) and Decision Tree (max depth)
+    settings, evaluating the (fold, model) tasks in a process pool.
+    Returns (best_params, cv_results): best_params maps 'knn' and 'decision_tree'
+    to their highest mean-accuracy settings (ties go to the earlier candidate,
+    i.e. fewer neighbors or a shallower tree); cv_results has one row per setting.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    k_values = [k for k in k_range if k >= 1]
+    tasks = []
+    for fold, (train_idx, test_idx) in enumerate(fold_splits(y, n_folds, random_state)):
+        tasks.extend(('knn', fold, train_idx, test_idx, metric, k_values) for metric in metrics)
+        tasks.append(('decision_tree', fold, train_idx, test_idx, list(depths), random_state))
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(X, y)) as pool:
+            fold_scores = list(pool.map(_run_task, tasks))
+    else:
+        _init_worker(X, y)
+        fold_scores = list(map(_run_task, tasks))
+
+    rows = {}
+    for model, params, fold, accuracy in (score for scores in fold_scores for score in scores):
+        key = (model, tuple(params.items()))
+        rows.setdefault(key, []).append(accuracy)
+    cv_results = pd.DataFrame([
+        {'model': model, 'params': dict(params), 'mean_accuracy': np.mean(accuracies), 'std_accuracy': np.std(accuracies)}
+        for (model, params), accuracies in rows.items()
+    ])
+
+    best_params = {}
+    for model, group in cv_results.groupby('model', sort=False):
+        # idxmax keeps the first (simplest) candidate on ties
+        best_params[model] = group.loc[group['mean_accuracy'].idxmax(), 'params']
+    return best_params, cv_results
+
+def print_tuning_summary(best_params, cv_results, top_n=5):
+    """
+    Prints the best settings per model and the top `top_n` settings overall.
+    """
+    print(f"\n--- Hyperparameter Search ({len(cv_results)} settings) ---")
+    top = cv_results.sort_values('mean_accuracy', ascending=False).head(top_n).copy()
+    top['params'] = top['params'].astype(str)
+    print(top.round(4).to_markdown(index=False))
+    for model, params in best_params.items():
+        print(f"Best {model}: {params}")
@@ -0,0 +1,166 @@
+import os
+import json
+import shutil
+import sqlite3
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from create_tables import get_load_version
+
+try:
+    import duckdb  # Optional: only needed for the 'duckdb' query backend
+except ImportError:
+    duckdb = None
+
+# --- Configuration ---
+DB_NAME = 'retail_dw.db'
+PARQUET_DIR = 'retail_dw_parquet'
+EXPORT_CHUNK_ROWS = 500000  # SalesFact rows read from SQLite per exported chunk
+BACKENDS = ('sqlite', 'duckdb')
+
+# Small tables exported as single Parquet files (SalesFact is partitioned by year/month)
+SMALL_TABLES = [
+    'TimeDim', 'CustomerDim', 'ProductDim', 'EtlLoadLog',
+    'AggSalesCountryQuarter', 'AggSalesCountryMonth', 'AggSalesProductYear', 'CustomerRFM',
+]
+VERSION_FILE = '_load_version.json'
+SOURCE_VIEW = 'WarehouseSource'  # One-row view naming the Parquet export a DuckDB connection reads
+
+def export_star_schema(db_name=DB_NAME, parquet_dir=PARQUET_DIR, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Exports the star schema to Parquet: SalesFact as a dataset partitioned by
+    year/month (hive layout), every other table as one file. SalesFact is streamed
+    in chunks, and the export is written to a temporary folder that replaces
+    `parquet_dir` only once complete.
+    """
+    if not os.path.exists(db_name):
+        print(f"ERROR: Database file not found at '{db_name}'.")
+        return
+
+    conn = sqlite3.connect(db_name)
+    staging_dir = parquet_dir + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+
+    # --- 1. Dimensions, load log and aggregates ---
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in SMALL_TABLES:
+        if table not in existing:
+            continue
+        table_df = pd.read_sql(f"SELECT * FROM {table}", conn)
+        pq.write_table(pa.Table.from_pandas(table_df, preserve_index=False), os.path.join(staging_dir, f"{table}.parquet"))
+        print(f"Exported {table} ({len(table_df)} rows).")
+
+    # --- 2. SalesFact, partitioned by year and month ---
+    fact_sql = """
+    SELECT f.*, t.year, t.month
+    FROM SalesFact f
+    JOIN TimeDim t ON f.time_id = t.time_id;
+    """
+    fact_rows = 0
+    for chunk_number, chunk in enumerate(pd.read_sql(fact_sql, conn, chunksize=chunk_rows)):
+        pq.write_to_dataset(
+            pa.Table.from_pandas(chunk, preserve_index=False),
+            root_path=os.path.join(staging_dir, 'SalesFact'),
+            partition_cols=['year', 'month'],
+            basename_template=f"part-{chunk_number}-{{i}}.parquet",
+        )
+        fact_rows += len(chunk)
+    print(f"Exported SalesFact ({fact_rows} rows).")
+
+    # Record which warehouse load the export reflects
+    with open(os.path.join(staging_dir, VERSION_FILE), 'w') as f:
+        json.dump({'load_version': get_load_version(conn)}, f)
+    conn.close()
+
+    shutil.rmtree(parquet_dir, ignore_errors=True)
+    os.replace(staging_dir, parquet_dir)
+    print(f"Star schema exported to '{parquet_dir}'.")
+
+def _sql_literal(path):
+    """
+    Quotes a file path for use as a string literal in DuckDB SQL.
+    """
+    return "'" + path.replace("'", "''") + "'"
+
+def connect(backend='sqlite', db_name=DB_NAME, parquet_dir=PARQUET_DIR):
+    """
+    Opens a query connection on the chosen backend:
+    'sqlite' -> the row-oriented warehouse file,
+    'duckdb' -> the Parquet export, exposed under the same table names, so the
+    OLAP and RFM SQL runs unchanged while reading only the columns it references.
+    """
+    if backend == 'sqlite':
+        return sqlite3.connect(db_name)
+    if backend != 'duckdb':
+        raise ValueError(f"Unknown backend '{backend}'. Choose one of {BACKENDS}.")
+    if duckdb is None:
+        raise ImportError("The 'duckdb' backend requires the duckdb package (pip install duckdb).")
+    if not os.path.isdir(parquet_dir):
+        raise FileNotFoundError(f"Parquet export not found at '{parquet_dir}'. Run columnar_backend.py first.")
+
+    conn = duckdb.connect()
+    conn.execute(f"CREATE VIEW {SOURCE_VIEW} AS SELECT {_sql_literal(os.path.abspath(parquet_dir))} AS path")
+    fact_glob = os.path.join(parquet_dir, 'SalesFact', '**', '*.parquet')
+    conn.execute(f"CREATE VIEW SalesFact AS SELECT * FROM read_parquet({_sql_literal(fact_glob)}, hive_partitioning = true)")
+    for table in SMALL_TABLES:
+        path = os.path.join(parquet_dir, f"{table}.parquet")
+        if os.path.exists(path):
+            conn.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet({_sql_literal(path)})")
+    return conn
+
+def read_sql(conn, sql, params=None):
+    """
+    Runs a query on either backend and returns a DataFrame.
+    """
+    if isinstance(conn, sqlite3.Connection):
+        return pd.read_sql(sql, conn, params=params)
+    return conn.execute(sql, list(params or [])).df()
+
+def source_path(conn):
+    """
+    Returns the path of the data a connection reads: the database file for SQLite
+    (and file-backed DuckDB), the Parquet export folder for DuckDB connections
+    opened by connect(). Cached results are kept apart by this path.
+    """
+    if not isinstance(conn, sqlite3.Connection):
+        try:
+            return conn.execute(f"SELECT path FROM {SOURCE_VIEW}").fetchone()[0]
+        except duckdb.CatalogException:
+            pass
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+def exported_load_version(parquet_dir=PARQUET_DIR):
+    """
+    Returns the warehouse load version the Parquet export was taken from (None if there is no export).
+    """
+    path = os.path.join(parquet_dir, VERSION_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)['load_version']
+
+
+def refresh_export(db_name=DB_NAME, parquet_dir=PARQUET_DIR):
+    """
+    Re-exports the star schema when the Parquet export is missing or was taken from
+    another warehouse load than the one `db_name` holds now, so the DuckDB backend
+    never answers from stale data.
+    """
+    if not os.path.exists(db_name):
+        return
+    conn = sqlite3.connect(db_name)
+    current = get_load_version(conn)
+    conn.close()
+    exported = exported_load_version(parquet_dir)
+    if exported == current:
+        return
+    if exported is None:
+        print("No Parquet export found. Exporting the star schema first...")
+    else:
+        print(f"Parquet export is from load '{exported}', the warehouse is at '{current}'. Re-exporting...")
+    export_star_schema(db_name, parquet_dir)
+
+if __name__ == '__main__':
+    export_star_schema()
@@ -1,5 +1,84 @@
 import sqlite3
 
+# ------------------- Analytical Indexes -------------------
+# Covering indexes on the SalesFact foreign keys let the OLAP joins read the
+# measures straight from the index, and the composite dimension indexes serve
+# the (country, year, quarter) and (year, month) roll-up/drill-down paths.
+# The invoice index serves per-invoice lookups (RFM store refresh, baskets).
+ANALYTICAL_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_salesfact_customer_cover ON SalesFact(customer_id, time_id, sales_amount, quantity);",
+    "CREATE INDEX IF NOT EXISTS ix_salesfact_time_cover ON SalesFact(time_id, customer_id, sales_amount, quantity);",
+    "CREATE INDEX IF NOT EXISTS ix_salesfact_product_cover ON SalesFact(product_id, time_id, sales_amount);",
+    "CREATE INDEX IF NOT EXISTS ix_salesfact_invoice ON SalesFact(invoice_no, customer_id, product_id);",
+    "CREATE INDEX IF NOT EXISTS ix_customerdim_country ON CustomerDim(country, customer_id);",
+    "CREATE INDEX IF NOT EXISTS ix_timedim_year_quarter ON TimeDim(year, quarter, time_id);",
+    "CREATE INDEX IF NOT EXISTS ix_timedim_year_month ON TimeDim(year, month, time_id);",
+]
+
+# Full-text index on product names (replaces LIKE '%...%' scans of ProductDim).
+# It is an external-content FTS5 table kept in sync with ProductDim by triggers.
+PRODUCT_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS ProductNameFTS USING fts5(product_name, content='ProductDim', content_rowid='product_id');",
+    """CREATE TRIGGER IF NOT EXISTS productdim_fts_insert AFTER INSERT ON ProductDim BEGIN
+        INSERT INTO ProductNameFTS(rowid, product_name) VALUES (new.product_id, new.product_name);
+    END;""",
+    """CREATE TRIGGER IF NOT EXISTS productdim_fts_delete AFTER DELETE ON ProductDim BEGIN
+        INSERT INTO ProductNameFTS(ProductNameFTS, rowid, product_name) VALUES ('delete', old.product_id, old.product_name);
+    END;""",
+    """CREATE TRIGGER IF NOT EXISTS productdim_fts_update AFTER UPDATE ON ProductDim BEGIN
+        INSERT INTO ProductNameFTS(ProductNameFTS, rowid, product_name) VALUES ('delete', old.product_id, old.product_name);
+        INSERT INTO ProductNameFTS(rowid, product_name) VALUES (new.product_id, new.product_name);
+    END;""",
+    "INSERT INTO ProductNameFTS(ProductNameFTS) VALUES ('rebuild');",
+]
+
+# Natural key and surrogate key of each dimension (the surrogate key is also the SalesFact column)
+NATURAL_KEYS = {
+    'TimeDim': ('date', 'time_id'),
+    'CustomerDim': ('cust_raw_id', 'customer_id'),
+    'ProductDim': ('stock_code', 'product_id'),
+}
+
+def deduplicate_dimensions(conn):
+    """
+    Merges dimension members that share a natural key (databases loaded before the
+    unique natural-key indexes existed) into the member with the highest surrogate
+    key, repointing SalesFact at it. The aggregate tables and the RFM feature store
+    are recomputed when members were merged. Returns the rows removed per dimension.
+    """
+    removed = {}
+    for table, (key_column, id_column) in NATURAL_KEYS.items():
+        conn.execute("DROP TABLE IF EXISTS temp.dim_remap;")
+        conn.execute(f"""
+        CREATE TEMP TABLE dim_remap AS
+        SELECT d.{id_column} AS old_id, k.keep_id AS new_id
+        FROM {table} d
+        JOIN (SELECT {key_column}, MAX({id_column}) AS keep_id FROM {table}
+              WHERE {key_column} IS NOT NULL GROUP BY {key_column} HAVING COUNT(*) > 1) k
+          ON d.{key_column} = k.{key_column}
+        WHERE d.{id_column} <> k.keep_id;
+        """)
+        removed[table] = conn.execute("SELECT COUNT(*) FROM temp.dim_remap").fetchone()[0]
+        if removed[table]:
+            conn.execute(f"""
+            UPDATE SalesFact SET {id_column} = (SELECT new_id FROM temp.dim_remap WHERE old_id = SalesFact.{id_column})
+            WHERE {id_column} IN (SELECT old_id FROM temp.dim_remap);
+            """)
+            conn.execute(f"DELETE FROM {table} WHERE {id_column} IN (SELECT old_id FROM temp.dim_remap);")
+            print(f"Merged {removed[table]} duplicate {table} members on {key_column}.")
+        conn.execute("DROP TABLE temp.dim_remap;")
+
+    if any(removed.values()):
+        # Roll-ups and RFM features keyed by the merged members are recomputed from the repointed facts
+        from olap_aggregates import AGGREGATE_GRAINS, refresh_aggregates
+        from rfm_feature_store import refresh_rfm_store
+        for table in AGGREGATE_GRAINS:
+            conn.execute(f"DELETE FROM {table};")
+        refresh_aggregates(conn)
+        conn.execute("DELETE FROM CustomerRFM;")
+        refresh_rfm_store(conn)
+    return removed
+
 def create_tables(db_name='retail_dw.db'):
     """
     Creates the retail data warehouse tables in SQLite.
@@ -68,12 +147,182 @@ def create_tables(db_name='retail_dw.db'):
     );
     """)
 
+    # ------------------- Aggregate Tables -------------------
+    # Materialized roll-ups of SalesFact, refreshed incrementally by the ETL
+    # (see olap_aggregates.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS AggSalesCountryQuarter (
+        country TEXT,
+        year INTEGER,
+        quarter INTEGER,
+        total_sales REAL,
+        total_quantity INTEGER,
+        row_count INTEGER,
+        PRIMARY KEY (country, year, quarter)
+    );
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS AggSalesCountryMonth (
+        country TEXT,
+        year INTEGER,
+        quarter INTEGER,
+        month INTEGER,
+        total_sales REAL,
+        total_quantity INTEGER,
+        row_count INTEGER,
+        PRIMARY KEY (country, year, quarter, month)
+    );
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS AggSalesProductYear (
+        product_id INTEGER,
+        year INTEGER,
+        total_sales REAL,
+        total_quantity INTEGER,
+        row_count INTEGER,
+        PRIMARY KEY (product_id, year)
+    );
+    """)
+
+    # ------------------- CustomerRFM -------------------
+    # RFM feature store, updated incrementally by the ETL (see rfm_feature_store.py).
+    # Recency is derived at read time from last_purchase_date for any snapshot date.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS CustomerRFM (
+        customer_id INTEGER PRIMARY KEY,
+        last_purchase_date TEXT,
+        invoice_count INTEGER,
+        monetary REAL,
+        FOREIGN KEY(customer_id) REFERENCES CustomerDim(customer_id)
+    );
+    """)
+
+    # ------------------- AssociationRule -------------------
+    # Mined basket rules (see rule_index.py). rule_id follows descending lift, and
+    # AssociationRuleItem is an inverted index from each antecedent item to its rules.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS AssociationRule (
+        rule_id INTEGER PRIMARY KEY,
+        antecedents TEXT,
+        consequents TEXT,
+        antecedent_size INTEGER,
+        support REAL,
+        confidence REAL,
+        lift REAL
+    );
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS AssociationRuleItem (
+        item TEXT,
+        rule_id INTEGER,
+        PRIMARY KEY (item, rule_id),
+        FOREIGN KEY(rule_id) REFERENCES AssociationRule(rule_id)
+    ) WITHOUT ROWID;
+    """)
+
+    # ------------------- Natural Keys -------------------
+    # Unique natural keys let the ETL upsert dimension members on repeated loads
+    # instead of appending duplicates. Duplicates left by earlier loads are merged first.
+    deduplicate_dimensions(conn)
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_timedim_date ON TimeDim(date);")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_customerdim_cust_raw_id ON CustomerDim(cust_raw_id);")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_productdim_stock_code ON ProductDim(stock_code);")
+
+    # ------------------- EtlLoadLog -------------------
+    # One row per ETL load; the latest high_water_mark (max invoice date loaded)
+    # drives incremental loads
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS EtlLoadLog (
+        load_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        loaded_at TEXT,
+        high_water_mark TEXT,
+        rows_loaded INTEGER
+    );
+    """)
+
     # Commit changes and close connection
     conn.commit()
     conn.close()
 
     print(f"Database '{db_name}' created and tables initialized successfully!")
 
+def get_load_version(conn):
+    """
+    Returns a token identifying the latest ETL load recorded in EtlLoadLog
+    ('empty' if nothing was loaded yet). It changes whenever new data is loaded
+    or the database is rebuilt, so it can be used to invalidate caches.
+    """
+    try:
+        latest = conn.execute(
+            "SELECT load_id, loaded_at FROM EtlLoadLog ORDER BY load_id DESC LIMIT 1"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        latest = None
+    return f"{latest[0]}@{latest[1]}" if latest else 'empty'
+
+def analyze_warehouse(conn):
+    """
+    Refreshes the query planner statistics (run after every load).
+    analysis_limit keeps ANALYZE cheap on large tables by sampling each index.
+    """
+    conn.execute("PRAGMA analysis_limit = 1000;")
+    conn.execute("ANALYZE;")
+
+def has_product_search(conn):
+    """
+    Returns True if the ProductNameFTS full-text index exists.
+    """
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ProductNameFTS'"
+    ).fetchone() is not None
+
+def print_query_plans(conn, queries, label):
+    """
+    Prints the EXPLAIN QUERY PLAN output of each named query.
+    """
+    print(f"\n=== Query plans {label} ===")
+    for name, sql in queries.items():
+        print(f"\n--- {name} ---")
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+            print(f"  {row[-1]}")
+
+def create_analytical_indexes(db_name='retail_dw.db', report_queries=None):
+    """
+    Creates the analytical index set and the product-name full-text index, then runs ANALYZE.
+    If `report_queries` (name -> SQL) is given, their query plans are printed before and after.
+    """
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+
+    if report_queries:
+        print_query_plans(conn, {name: sql for name, sql in report_queries.items() if 'ProductNameFTS' not in sql}, 'before indexing')
+
+    for sql in ANALYTICAL_INDEXES:
+        cursor.execute(sql)
+
+    try:
+        for sql in PRODUCT_SEARCH_DDL:
+            cursor.execute(sql)
+    except sqlite3.OperationalError as e:
+        # Some SQLite builds ship without FTS5; product slices then fall back to LIKE
+        print(f"WARNING: Full-text index not created ({e}).")
+
+    conn.commit()
+    analyze_warehouse(conn)
+    conn.commit()
+
+    if report_queries:
+        print_query_plans(conn, report_queries, 'after indexing')
+
+    conn.close()
+    print(f"Analytical indexes created and statistics refreshed in '{db_name}'.")
+
 # ------------------- Main -------------------
 if __name__ == "__main__":
     create_tables()
+
+    # Index the star schema for the OLAP workload and show the effect on its query plans
+    from olap_queries import OLAP_QUERIES, SLICE_LIKE_SQL
+    create_analytical_indexes(report_queries={**OLAP_QUERIES, 'slice (LIKE fallback)': SLICE_LIKE_SQL})
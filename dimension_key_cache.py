@@ -0,0 +1,122 @@
+import os
+import numpy as np
+import pandas as pd
+
+from create_tables import get_load_version
+
+# --- Configuration ---
+# Natural key and surrogate key column of each dimension table
+DIMENSION_KEYS = {
+    'TimeDim': ('date', 'time_id'),
+    'CustomerDim': ('cust_raw_id', 'customer_id'),
+    'ProductDim': ('stock_code', 'product_id'),
+}
+# Text natural keys are held as fixed-width unicode arrays, numeric ones as int64
+KEY_DTYPES = {'TimeDim': str, 'CustomerDim': np.int64, 'ProductDim': str}
+
+def key_cache_path(db_name):
+    """
+    Returns the file the key cache of `db_name` is persisted to (retail_dw.db -> retail_dw_keys.npz).
+    """
+    return f"{os.path.splitext(db_name)[0]}_keys.npz"
+
+def _as_key_array(table, natural_keys):
+    """
+    Converts natural keys to the compact NumPy dtype used for `table`.
+    """
+    return np.asarray(natural_keys).astype(KEY_DTYPES[table])
+
+def build_key_cache(conn):
+    """
+    Reads the natural-key -> surrogate-key pairs of every dimension once from the database.
+    Each dimension is stored as two aligned arrays sorted by natural key.
+    """
+    key_cache = {'load_version': get_load_version(conn)}
+    for table, (key_column, id_column) in DIMENSION_KEYS.items():
+        members = pd.read_sql(
+            f"SELECT {key_column}, MAX({id_column}) AS {id_column} FROM {table} "
+            f"WHERE {key_column} IS NOT NULL GROUP BY {key_column}", conn
+        )
+        keys = _as_key_array(table, members[key_column])
+        ids = members[id_column].to_numpy(dtype=np.int64)
+        order = np.argsort(keys, kind='stable')
+        key_cache[table] = (keys[order], ids[order])
+    return key_cache
+
+def _matches_dimensions(conn, saved):
+    """
+    Returns True if every cached dimension has as many members as its table and
+    ends at the same surrogate key. The load version alone has one-second
+    resolution, so a database rebuilt and reloaded within that second would
+    otherwise pass with a stale cache.
+    """
+    for table, (key_column, id_column) in DIMENSION_KEYS.items():
+        ids = saved[f"{table}_ids"]
+        rows, max_id = conn.execute(
+            f"SELECT COUNT(*), COALESCE(MAX({id_column}), 0) FROM {table} WHERE {key_column} IS NOT NULL"
+        ).fetchone()
+        if rows != len(ids) or max_id != (int(ids.max()) if len(ids) else 0):
+            return False
+    return True
+
+def load_key_cache(conn, cache_file):
+    """
+    Loads the persisted key cache, rebuilding it from the database only when it is
+    missing, was saved for a different load of the warehouse, or no longer matches
+    the dimension tables.
+    """
+    if os.path.exists(cache_file):
+        with np.load(cache_file, allow_pickle=False) as saved:
+            if str(saved['load_version']) == get_load_version(conn) and _matches_dimensions(conn, saved):
+                key_cache = {'load_version': str(saved['load_version'])}
+                for table in DIMENSION_KEYS:
+                    key_cache[table] = (saved[f"{table}_keys"], saved[f"{table}_ids"])
+                return key_cache
+        print("Key cache is out of date. Rebuilding it from the dimension tables...")
+    return build_key_cache(conn)
+
+def save_key_cache(key_cache, cache_file, load_version):
+    """
+    Persists the key cache for the given warehouse load version.
+    """
+    key_cache['load_version'] = load_version
+    arrays = {'load_version': np.array(load_version)}
+    for table in DIMENSION_KEYS:
+        arrays[f"{table}_keys"], arrays[f"{table}_ids"] = key_cache[table]
+    np.savez(cache_file, **arrays)
+
+def missing_members(key_cache, table, natural_keys):
+    """
+    Returns a boolean mask marking the natural keys that have no surrogate key yet.
+    """
+    keys, _ = key_cache[table]
+    return ~np.isin(_as_key_array(table, natural_keys), keys)
+
+def assign_surrogate_keys(key_cache, table, natural_keys):
+    """
+    Allocates surrogate keys for new (unique, not yet cached) natural keys,
+    continuing after the largest key in use, and adds them to the cache.
+    """
+    keys, ids = key_cache[table]
+    new_keys = _as_key_array(table, natural_keys)
+    next_id = int(ids.max()) + 1 if len(ids) else 1
+    new_ids = np.arange(next_id, next_id + len(new_keys), dtype=np.int64)
+
+    all_keys = np.concatenate([keys, new_keys])
+    all_ids = np.concatenate([ids, new_ids])
+    order = np.argsort(all_keys, kind='stable')
+    key_cache[table] = (all_keys[order], all_ids[order])
+    return new_ids
+
+def resolve_surrogate_keys(key_cache, table, natural_keys):
+    """
+    Maps a whole batch of natural keys to surrogate keys with a vectorized
+    binary search over the sorted key array. Unknown keys raise a KeyError.
+    """
+    keys, ids = key_cache[table]
+    values = _as_key_array(table, natural_keys)
+    positions = np.searchsorted(keys, values).clip(max=max(len(keys) - 1, 0))
+    found = (keys[positions] == values) if len(keys) else np.zeros(len(values), dtype=bool)
+    if not found.all():
+        raise KeyError(f"{(~found).sum()} natural keys have no surrogate key in {table}")
+    return ids[positions]
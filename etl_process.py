@@ -1,22 +1,63 @@
 
 import pandas as pd
+import numpy as np
 import sqlite3
+import os
+import time
 from datetime import datetime
 
+import dimension_key_cache
+import olap_aggregates
+import rfm_feature_store
+from create_tables import get_load_version, analyze_warehouse
+
+try:
+    import resource  # Not available on Windows; peak RSS is then reported as n/a
+except ImportError:
+    resource = None
+
 # --- Configuration ---
 DATA_FILE = 'Online Retail.xlsx' 
 DB_NAME = 'retail_dw.db'
 
 SHEET_NAME = 'Online Retail' 
 
+# 'incremental' loads only rows newer than the high-water mark recorded in EtlLoadLog;
+# 'full' loads every extracted row (use on a freshly created database)
+LOAD_MODE = 'incremental'
+
+# --- Bulk Load Settings ---
+# 'WAL' keeps the database crash-safe and readable while loading;
+# 'OFF' (no rollback journal) is fastest but a crash mid-load can corrupt the file
+JOURNAL_MODE = 'WAL'
+SYNCHRONOUS = 'NORMAL'
+CACHE_SIZE_KB = 262144  # 256 MB page cache
+BATCH_SIZE = 50000      # Rows per executemany call
+# Drop SalesFact indexes before the fact load and rebuild them afterwards
+# (worth it for large full loads; small incremental deltas are faster without it)
+REBUILD_INDEXES = False
+
+# Source text columns read straight into categoricals, so they are never held as one string per row
+SOURCE_CATEGORICALS = ['InvoiceNo', 'StockCode', 'Description', 'Country']
+
+# Set to a row count (e.g. 50000) to stream the source in fixed-size chunks
+# instead of loading the whole workbook at once. None keeps the original behaviour.
+CHUNK_SIZE = None
+
 def extract_data(file_path, sheet_name):
     """
-    Extracts data from the raw Excel file.
+    Extracts data from the raw source file (Excel, CSV or Parquet).
     """
     print(f"Extracting data from {file_path}...")
     try:
-        # Read the Excel file into a Pandas DataFrame
-        df = pd.read_excel(file_path, sheet_name=sheet_name)
+        # Read the source file into a Pandas DataFrame
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension == '.csv':
+            df = pd.read_csv(file_path, dtype={column: 'category' for column in SOURCE_CATEGORICALS})
+        elif extension == '.parquet':
+            df = pd.read_parquet(file_path, read_dictionary=SOURCE_CATEGORICALS)
+        else:
+            df = pd.read_excel(file_path, sheet_name=sheet_name)
         print(f"Original shape: {df.shape}")
         return df
     except FileNotFoundError:
@@ -26,84 +67,276 @@ def extract_data(file_path, sheet_name):
         print(f"ERROR reading Excel sheet: {e}. Check if the sheet name '{sheet_name}' is correct.")
         return None
 
+def extract_data_chunks(file_path, sheet_name, chunk_size):
+    """
+    Streams the raw source file as DataFrames of at most `chunk_size` rows,
+    so only one chunk is held in memory at a time.
+    Excel sheets are read row by row in openpyxl read-only mode; CSV and
+    Parquet sources are read with their native chunked readers.
+    """
+    print(f"Streaming data from {file_path} in chunks of {chunk_size} rows...")
+    if not os.path.exists(file_path):
+        print(f"ERROR: Data file not found at '{file_path}'. Please check the filename.")
+        return
+
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.csv':
+        for chunk in pd.read_csv(file_path, chunksize=chunk_size, dtype={column: 'category' for column in SOURCE_CATEGORICALS}):
+            yield chunk
+    elif extension == '.parquet':
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(file_path, read_dictionary=SOURCE_CATEGORICALS)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        from openpyxl import load_workbook
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            if sheet_name not in workbook.sheetnames:
+                print(f"ERROR reading Excel sheet: Check if the sheet name '{sheet_name}' is correct.")
+                return
+            rows = workbook[sheet_name].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            buffer = []
+            for row in rows:
+                buffer.append(row)
+                if len(buffer) == chunk_size:
+                    yield pd.DataFrame(buffer, columns=header)
+                    buffer = []
+            if buffer:
+                yield pd.DataFrame(buffer, columns=header)
+        finally:
+            workbook.close()
+
+def as_category(values):
+    """
+    Converts a column to a categorical of strings. Each distinct value is converted
+    to text once rather than once per row, and values that only differ in type
+    (85123 and '85123' in a spreadsheet) share one category. Missing values stay missing.
+    """
+    codes, uniques = pd.factorize(values)
+    labels, categories = pd.factorize(pd.Index(uniques).astype(str))
+    # Code -1 (missing) indexes the appended -1 and stays missing
+    return pd.Categorical.from_codes(np.append(labels, -1)[codes], categories=categories)
+
 def transform_data(df):
     """
     Cleans and transforms the data for loading into the Data Warehouse (DW).
+    Returns a compact frame: invoice numbers, stock codes, descriptions and countries
+    as categoricals, downcast integer IDs and quantities (prices and amounts stay float64, so cents are exact).
     """
     print("Starting data transformation...")
     
     # 1. Clean Column Names (Standardize to lowercase)
     df.columns = df.columns.str.lower().str.replace(' ', '_')
 
-    # 2. Drop rows with missing CustomerID (essential for CustomerDim)
-    df.dropna(subset=['customerid'], inplace=True)
-    df['customerid'] = df['customerid'].astype(int) # Convert ID to integer
+    # 2. Filter Invalid Rows with one combined mask (a single copy instead of one per step):
+    #    - missing CustomerID (essential for CustomerDim) or stock code (every fact row needs a product)
+    #    - cancelled transactions (InvoiceNo starting with 'C'), checked once per distinct invoice
+    #    - zero or negative Quantity/UnitPrice (invalid transactions)
+    invoices = as_category(df['invoiceno'])
+    cancelled_codes = np.flatnonzero(invoices.categories.str.startswith('C'))
+    keep = (
+        ~np.isin(invoices.codes, cancelled_codes)
+        & df['customerid'].notna().to_numpy()
+        & df['stockcode'].notna().to_numpy()
+        & (df['quantity'] > 0).to_numpy()
+        & (df['unitprice'] > 0).to_numpy()
+    )
 
-    # 3. Filter out cancelled transactions (InvoiceNo starting with 'C')
-    # These are usually represented by negative quantities as well, but this is a good check
-    df = df[~df['invoiceno'].astype(str).str.startswith('C')]
+    # 3. Build the Compact Frame column by column from the kept rows only
+    #    (each filtered source column is a temporary, freed as soon as it is converted)
+    transformed = pd.DataFrame({
+        'invoiceno': invoices[keep].remove_unused_categories(),
+        # Stock codes mix numeric and alphanumeric values; as text every chunk agrees
+        'stockcode': as_category(df['stockcode'][keep]),
+        'description': as_category(df['description'][keep]),
+        'quantity': pd.to_numeric(df['quantity'][keep].to_numpy(), downcast='integer'),
+        'invoicedate': pd.to_datetime(df['invoicedate'][keep]).to_numpy(),
+        'unitprice': df['unitprice'][keep].to_numpy(dtype=np.float64),
+        'customerid': pd.to_numeric(df['customerid'][keep].to_numpy(dtype=np.int64), downcast='integer'),
+        'country': as_category(df['country'][keep]),
+    })
     
-    # 4. Filter out zero or negative Quantity/UnitPrice (invalid transactions)
-    df = df[(df['quantity'] > 0) & (df['unitprice'] > 0)]
+    # 4. Calculate Total Sales Amount (Key fact measure)
+    transformed['sales_amount'] = transformed['quantity'] * transformed['unitprice']
     
-    # 5. Calculate Total Sales Amount (Key fact measure)
-    df['sales_amount'] = df['quantity'] * df['unitprice']
-    
-    # 6. Time and Product Cleaning
-    df['invoicedate'] = pd.to_datetime(df['invoicedate'])
-    
-    print(f"Transformed shape: {df.shape}")
-    return df
+    print(f"Transformed shape: {transformed.shape}")
+    return transformed
 
-def load_data(df, db_name):
+def get_high_water_mark(db_name):
     """
-    Loads transformed data into the Star Schema tables.
+    Returns the latest invoice date loaded into the warehouse (None if nothing was loaded yet).
     """
     conn = sqlite3.connect(db_name)
+    try:
+        high_water_mark = conn.execute("SELECT MAX(high_water_mark) FROM EtlLoadLog").fetchone()[0]
+    except sqlite3.OperationalError:
+        print("WARNING: EtlLoadLog not found. Re-run create_tables.py to enable incremental loads.")
+        high_water_mark = None
+    finally:
+        conn.close()
+    return pd.Timestamp(high_water_mark) if high_water_mark else None
+
+def _as_rows(df):
+    """
+    Returns the rows of `df` as tuples of plain Python values ready for executemany
+    (converting whole columns with tolist is several times faster than itertuples).
+    """
+    return zip(*(df[column].tolist() for column in df.columns))
+
+def _upsert_dimension(conn, table, dim_df, key_column):
+    """
+    Inserts the rows of `dim_df` into `table`, skipping members whose natural key
+    already exists, so repeated or incremental loads never duplicate dimension members.
+    """
+    columns = list(dim_df.columns)
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT({key_column}) DO NOTHING"
+    )
+    conn.executemany(sql, _as_rows(dim_df))
+
+def connect_for_bulk_load(db_name, journal_mode=JOURNAL_MODE, synchronous=SYNCHRONOUS, cache_size_kb=CACHE_SIZE_KB):
+    """
+    Opens a connection tuned for bulk loading. The connection is in autocommit mode,
+    so callers wrap their inserts in an explicit BEGIN ... COMMIT transaction.
+    """
+    conn = sqlite3.connect(db_name, isolation_level=None)
+    conn.execute(f"PRAGMA journal_mode = {journal_mode};")
+    conn.execute(f"PRAGMA synchronous = {synchronous};")
+    conn.execute(f"PRAGMA cache_size = -{cache_size_kb};")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    return conn
+
+def drop_indexes(conn, table):
+    """
+    Drops the explicitly created indexes of `table` and returns their CREATE statements.
+    """
+    indexes = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table,)
+    ).fetchall()
+    for name, _ in indexes:
+        conn.execute(f"DROP INDEX {name};")
+    return [sql for _, sql in indexes]
+
+def rebuild_indexes(conn, index_statements):
+    """
+    Re-creates indexes previously removed with drop_indexes.
+    """
+    for sql in index_statements:
+        conn.execute(sql)
+
+def bulk_load_table(conn, table, df, batch_size=BATCH_SIZE):
+    """
+    Appends `df` to `table` with batched executemany calls, binding plain Python
+    tuples instead of going through DataFrame.to_sql. The caller owns the transaction.
+    """
+    columns = list(df.columns)
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    for start in range(0, len(df), batch_size):
+        conn.executemany(sql, _as_rows(df.iloc[start:start + batch_size]))
+
+def _load_new_members(conn, key_cache, table, dim_df):
+    """
+    Inserts only the members of `dim_df` missing from the key cache, with surrogate
+    keys allocated by the cache, so the table never has to be read back.
+    """
+    key_column, id_column = dimension_key_cache.DIMENSION_KEYS[table]
+    new_members = dim_df[dimension_key_cache.missing_members(key_cache, table, dim_df[key_column])]
+    new_ids = dimension_key_cache.assign_surrogate_keys(key_cache, table, new_members[key_column])
+    _upsert_dimension(conn, table, new_members.assign(**{id_column: new_ids}), key_column)
+    print(f"{len(new_members)} new {table} members.")
+
+def calendar_dimension(first_day, last_day):
+    """
+    Returns the TimeDim members for every calendar day from `first_day` to
+    `last_day` (inclusive), one row per day, with all attributes computed by
+    NumPy date arithmetic over the whole range at once.
+    """
+    days = np.arange(first_day, last_day + 1, dtype='datetime64[D]')
+    months = days.astype('datetime64[M]')
+    years = days.astype('datetime64[Y]')
+    month = (months - years).astype(np.int64) + 1
+    # 1970-01-01 (day 0) was a Thursday; Monday = 0 like pandas dayofweek
+    weekday = (days.astype(np.int64) + 3) % 7
+    return pd.DataFrame({
+        'date': np.datetime_as_string(days, unit='D'),
+        'day': (days - months).astype(np.int64) + 1,
+        'month': month,
+        'quarter': (month - 1) // 3 + 1,
+        'year': years.astype(np.int64) + 1970,
+        'is_weekend': (weekday >= 5).astype(np.int64),
+    })
+
+def load_data(df, db_name, high_water_mark=None, rebuild_fact_indexes=REBUILD_INDEXES):
+    """
+    Loads transformed data into the Star Schema tables in a single transaction.
+    Dimension members are upserted on their natural keys (date, cust_raw_id, stock_code),
+    so this can be called once per chunk when the source is streamed.
+    If `high_water_mark` is given, only rows with a later invoice date are loaded.
+    """
+    if high_water_mark is not None:
+        df = df[df['invoicedate'] > high_water_mark]
+        print(f"Incremental load: {len(df)} rows after high-water mark {high_water_mark}.")
+    if df.empty:
+        print("No new rows to load.")
+        return
+
+    conn = connect_for_bulk_load(db_name)
     cursor = conn.cursor()
     print(f"Connected to database '{db_name}'.")
 
+    # Natural key -> surrogate key arrays, persisted between runs
+    key_cache_file = dimension_key_cache.key_cache_path(db_name)
+    key_cache = dimension_key_cache.load_key_cache(conn, key_cache_file)
+
+    # Everything below is committed (or discarded) as one transaction
+    cursor.execute("BEGIN")
+
     # --- 1. Load TimeDim ---
     print("Loading TimeDim...")
-    time_df = df[['invoicedate']].drop_duplicates().sort_values(by='invoicedate').reset_index(drop=True)
-    time_df['date'] = time_df['invoicedate'].dt.date.astype(str)
-    time_df['day'] = time_df['invoicedate'].dt.day
-    time_df['month'] = time_df['invoicedate'].dt.month
-    time_df['quarter'] = time_df['invoicedate'].dt.quarter
-    time_df['year'] = time_df['invoicedate'].dt.year
-    time_df['is_weekend'] = time_df['invoicedate'].dt.dayofweek.apply(lambda x: 1 if x >= 5 else 0)
-    time_df['time_id'] = time_df.index + 1 # Simple sequence ID
-    
-    time_df[['date', 'day', 'month', 'quarter', 'year', 'is_weekend']].to_sql(
-        'TimeDim', conn, if_exists='append', index=False
-    )
-    # Create a mapping for easy lookup later
-    time_map = time_df.set_index('date')['time_id'].to_dict()
+    # A calendar: one member per day over the batch's date range. Fact rows reference it
+    # by their integer day offset from the first day, not by formatted date strings.
+    sale_days = df['invoicedate'].to_numpy().astype('datetime64[D]')
+    first_day, last_day = sale_days.min(), sale_days.max()
+    known_dates, _ = key_cache['TimeDim']
+    if len(known_dates):
+        # Continue from the last day already in the calendar (cached keys are sorted ISO dates),
+        # so loads leave no gaps
+        first_day = min(first_day, np.datetime64(known_dates[-1], 'D') + 1)
+    calendar_df = calendar_dimension(first_day, last_day)
+
+    _load_new_members(conn, key_cache, 'TimeDim', calendar_df)
+    calendar_ids = dimension_key_cache.resolve_surrogate_keys(key_cache, 'TimeDim', calendar_df['date'])
 
     # --- 2. Load CustomerDim ---
     print("Loading CustomerDim...")
-    customer_df = df[['customerid', 'country']].drop_duplicates().reset_index(drop=True)
-    customer_df.rename(columns={'customerid': 'cust_raw_id'}, inplace=True)
+    first_purchase = ~df['customerid'].duplicated().to_numpy()
+    customer_df = pd.DataFrame({
+        'cust_raw_id': df['customerid'].to_numpy()[first_purchase],
+        'country': df['country'].array[first_purchase],
+    })
     # Note: Other columns (name, age, etc.) are missing in the source data and are not loaded, 
     # but the schema allows for them if we were to enrich the data later.
     
-    customer_df[['cust_raw_id', 'country']].to_sql(
-        'CustomerDim', conn, if_exists='append', index=False
-    )
-    # Create a mapping for easy lookup later
-    customer_map = pd.read_sql("SELECT customer_id, cust_raw_id FROM CustomerDim", conn).set_index('cust_raw_id')['customer_id'].to_dict()
+    _load_new_members(conn, key_cache, 'CustomerDim', customer_df[['cust_raw_id', 'country']])
 
 
     # --- 3. Load ProductDim ---
     print("Loading ProductDim...")
-    product_df = df[['stockcode', 'product_name', 'unitprice']].drop_duplicates(subset=['stockcode']).reset_index(drop=True)
-    
-    # Create the surrogate key
-    product_df.index.name = 'product_id'
-    product_df = product_df.reset_index()
-    
-  # Standardize column names for insertion to match the ProductDim schema
-    product_df.rename(columns={'description': 'product_name', 'unitprice': 'unit_price'}, inplace=True)
+    # One member per stock code category present in this batch, taken from its first row
+    # (column names match the ProductDim schema; the surrogate product_id is allocated by the key cache)
+    stock_codes = df['stockcode'].array
+    product_codes, first_rows = np.unique(stock_codes.codes, return_index=True)
+    product_df = pd.DataFrame({
+        'stock_code': stock_codes.categories[product_codes],
+        'product_name': df['description'].array[first_rows],
+        'unit_price': df['unitprice'].to_numpy()[first_rows],
+    })
     
     # Add placeholder columns (since the data doesn't provide them but the schema requires them)
     product_df['category'] = 'Unknown'
@@ -111,7 +344,6 @@ def load_data(df, db_name):
     
     # This list must be an EXACT match for the columns in ProductDim in your create_tables.py
     product_data_to_insert = product_df[[
-        'product_id', 
         'stock_code', 
         'product_name', 
         'category', 
@@ -119,47 +351,174 @@ def load_data(df, db_name):
         'unit_price'
     ]]
     
-    product_data_to_insert.to_sql(
-        'ProductDim', conn, if_exists='append', index=False
-    )
-    
-    # Create a mapping for easy lookup later
-    # This must use the column names available in the table
-    product_map = pd.read_sql("SELECT product_id, stockcode FROM ProductDim", conn).set_index('stockcode')['product_id'].to_dict()
+    _load_new_members(conn, key_cache, 'ProductDim', product_data_to_insert)
     
     
     # --- 4. Load SalesFact ---
     print("Loading SalesFact...")
-    fact_df = df.copy()
-
-    # Map the foreign keys using the generated dimension IDs
-    fact_df['time_id'] = fact_df['invoicedate'].dt.date.astype(str).map(time_map)
-    fact_df['customer_id'] = fact_df['customerid'].map(customer_map)
-    fact_df['product_id'] = fact_df['stockcode'].map(product_map)
+    # Resolve the foreign keys for the whole batch against the key cache
+    # (products once per stock code category, then broadcast to the rows through the codes)
+    product_ids = np.zeros(len(stock_codes.categories), dtype=np.int64)
+    product_ids[product_codes] = dimension_key_cache.resolve_surrogate_keys(key_cache, 'ProductDim', product_df['stock_code'])
 
-    # Select and rename columns for the fact table - INCLUDE 'country' to match schema!
-    sales_fact_data = fact_df[[
-        'invoiceno', 'product_id', 'customer_id', 'time_id', 'quantity', 'unitprice', 'sales_amount', 'country' 
-    ]]
-    sales_fact_data.rename(columns={'invoiceno': 'invoice_no', 'unitprice': 'unit_price'}, inplace=True)
+    # Columns in SalesFact order - INCLUDE 'country' to match schema! (no copy of the batch is made)
+    sales_fact_data = pd.DataFrame({
+        'invoice_no': df['invoiceno'].array,
+        'product_id': product_ids[stock_codes.codes],
+        'customer_id': dimension_key_cache.resolve_surrogate_keys(key_cache, 'CustomerDim', df['customerid']),
+        'time_id': calendar_ids[(sale_days - first_day).astype(np.int64)],
+        'quantity': df['quantity'].to_numpy(),
+        'unit_price': df['unitprice'].to_numpy(),
+        'sales_amount': df['sales_amount'].to_numpy(),
+        'country': df['country'].array,
+    })
     
     # Load into the Fact table
-    sales_fact_data.to_sql(
-        'SalesFact', conn, if_exists='append', index=False
+    last_sales_id = cursor.execute("SELECT COALESCE(MAX(sales_id), 0) FROM SalesFact").fetchone()[0]
+    index_statements = drop_indexes(conn, 'SalesFact') if rebuild_fact_indexes else []
+    bulk_load_table(conn, 'SalesFact', sales_fact_data)
+    rebuild_indexes(conn, index_statements)
+
+    # --- 5. Refresh the aggregate tables and RFM store from the newly loaded fact rows only ---
+    print("Refreshing aggregate tables...")
+    olap_aggregates.refresh_aggregates(conn, last_sales_id)
+    print("Refreshing RFM feature store...")
+    rfm_feature_store.refresh_rfm_store(conn, last_sales_id)
+
+    # --- 6. Record the load (advances the high-water mark) ---
+    cursor.execute(
+        "INSERT INTO EtlLoadLog (loaded_at, high_water_mark, rows_loaded) VALUES (?, ?, ?)",
+        (datetime.now().isoformat(sep=' ', timespec='seconds'), str(df['invoicedate'].max()), len(sales_fact_data))
     )
     
     conn.commit()
+    # Persist the key cache only once the load it describes is committed
+    dimension_key_cache.save_key_cache(key_cache, key_cache_file, get_load_version(conn))
+    # Keep the planner statistics current for the analytical indexes
+    analyze_warehouse(conn)
     conn.close()
     print("ETL process complete! Data loaded into the data warehouse.")
 
 
-if __name__ == '__main__':
-    # 1. Extraction
-    raw_data_df = extract_data(DATA_FILE, SHEET_NAME)
-    
-    if raw_data_df is not None:
-        # 2. Transformation
-        transformed_df = transform_data(raw_data_df)
+def _peak_rss_mb():
+    """
+    Returns the peak resident set size of this process since it started in MB
+    (None if unavailable).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / (1024 * 1024) if peak > 1024 * 1024 * 1024 else peak / 1024
+
+def _reset_peak_rss():
+    """
+    Restarts the kernel's peak RSS counter (VmHWM) from the current RSS, so the next
+    _stage_peak_rss_mb() covers only what ran in between. Linux only; returns False
+    where the counter can't be reset.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def _stage_peak_rss_mb():
+    """
+    Returns the peak RSS in MB since the last _reset_peak_rss() (None if unavailable).
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def run_streaming_etl(file_path, sheet_name, db_name, chunk_size, incremental=True):
+    """
+    Runs the ETL in bounded memory: each extracted chunk flows through
+    transform_data and load_data before the next one is read.
+    Prints rows/sec and the peak RSS reached during each of the extract, transform
+    and load stages (Linux; the peak counter is reset before every stage), plus the
+    peak RSS of the whole process.
+    """
+    # Read the high-water mark once, so chunks loaded during this run don't filter each other out
+    high_water_mark = get_high_water_mark(db_name) if incremental else None
+
+    stats = {stage: {'rows': 0, 'seconds': 0.0, 'stage_peak_rss_mb': None} for stage in ('extract', 'transform', 'load')}
+    # Resetting the peak counter also resets the process peak getrusage reports, so take it first
+    process_peak = _peak_rss_mb()
+
+    def start_stage():
+        stage_tracked = _reset_peak_rss()
+        return stage_tracked, time.perf_counter()
+
+    def record(stage, rows, started):
+        nonlocal process_peak
+        stage_tracked, start = started
+        stats[stage]['seconds'] += time.perf_counter() - start
+        stats[stage]['rows'] += rows
+        stage_peak = _stage_peak_rss_mb() if stage_tracked else None
+        if stage_peak is not None:
+            stats[stage]['stage_peak_rss_mb'] = max(stats[stage]['stage_peak_rss_mb'] or 0.0, stage_peak)
+            process_peak = max(process_peak or 0.0, stage_peak)
+        else:
+            process_peak = _peak_rss_mb()
+
+    chunks = extract_data_chunks(file_path, sheet_name, chunk_size)
+    chunk_number = 0
+    while True:
+        started = start_stage()
+        raw_chunk = next(chunks, None)
+        if raw_chunk is None:
+            break
+        record('extract', len(raw_chunk), started)
+        chunk_number += 1
+        print(f"\n--- Chunk {chunk_number} ({len(raw_chunk)} rows) ---")
+
+        started = start_stage()
+        transformed_chunk = transform_data(raw_chunk)
+        del raw_chunk
+        record('transform', len(transformed_chunk), started)
+
+        started = start_stage()
+        load_data(transformed_chunk, db_name, high_water_mark)
+        record('load', len(transformed_chunk), started)
+
+    print("\n--- Streaming ETL Stage Metrics ---")
+    report = pd.DataFrame(stats).T
+    report['rows_per_sec'] = (report['rows'] / report['seconds'].where(report['seconds'] > 0)).round(0)
+    report['seconds'] = report['seconds'].astype(float).round(3)
+    report['stage_peak_rss_mb'] = report['stage_peak_rss_mb'].astype(float).round(1)
+    print(report[['rows', 'seconds', 'rows_per_sec', 'stage_peak_rss_mb']].to_markdown())
+    print(f"Process peak RSS: {process_peak:.1f} MB" if process_peak is not None else "Process peak RSS: n/a")
+    return stats
+
+
+def run_etl(file_path=DATA_FILE, sheet_name=SHEET_NAME, db_name=DB_NAME, load_mode=LOAD_MODE, chunk_size=CHUNK_SIZE):
+    """
+    Runs the configured ETL: streaming when `chunk_size` is set, otherwise one
+    in-memory extract/transform/load pass.
+    """
+    if chunk_size:
+        # Streaming mode: extract, transform and load one chunk at a time
+        run_streaming_etl(file_path, sheet_name, db_name, chunk_size, incremental=(load_mode == 'incremental'))
+    else:
+        # 1. Extraction
+        raw_data_df = extract_data(file_path, sheet_name)
         
-        # 3. Loading
-        load_data(transformed_df, DB_NAME)
\ No newline at end of file
+        if raw_data_df is not None:
+            # 2. Transformation (the raw frame is released before loading)
+            transformed_df = transform_data(raw_data_df)
+            del raw_data_df
+            
+            # 3. Loading (incremental mode only appends rows newer than the last load)
+            high_water_mark = get_high_water_mark(db_name) if load_mode == 'incremental' else None
+            load_data(transformed_df, db_name, high_water_mark)
+
+
+if __name__ == '__main__':
+    run_etl()
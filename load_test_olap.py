@@ -0,0 +1,121 @@
+import random
+import sqlite3
+import threading
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from olap_queries import (
+    DB_NAME, PRODUCT_SEARCH_FILTER, make_query, slice_cube, dice_cube,
+    open_read_only_pool, close_pool, run_pooled_query
+)
+
+# --- Configuration ---
+CLIENT_COUNTS = [1, 2, 4, 8, 16, 32, 64]
+REQUESTS_PER_CLIENT = 50
+USE_CACHE = False        # False measures the database itself rather than the result cache
+SIMULATE_WRITER = True   # Keep a concurrent writer busy to mimic an ETL load in progress
+
+def build_workload(db_name):
+    """
+    Returns a list of OLAP queries mimicking BI traffic: the standard report
+    queries plus per-country drill-downs and dices.
+    """
+    conn = sqlite3.connect(db_name)
+    countries = [row[0] for row in conn.execute("SELECT DISTINCT country FROM CustomerDim WHERE country IS NOT NULL")]
+    conn.close()
+
+    base_drilldown = make_query(['year', 'month'], ['total_sales', 'total_quantity'], order_by='total_sales DESC', limit=10)
+    workload = [
+        make_query(['country', 'year', 'quarter'], ['total_sales'], order_by='total_sales DESC', limit=10),
+        make_query(['year'], ['total_sales'], {PRODUCT_SEARCH_FILTER: 'SET'}, order_by='year'),
+        make_query(['country'], ['total_sales'], order_by='total_sales DESC', limit=5),
+        make_query(['year', 'quarter'], ['total_sales', 'invoice_count']),
+    ]
+    workload += [slice_cube(base_drilldown, 'country', country) for country in countries]
+    if len(countries) >= 2:
+        workload.append(dice_cube(make_query(['country', 'stock_code'], ['total_sales'], order_by='total_sales DESC', limit=10),
+                                  {'country': countries[:2]}))
+    return workload
+
+def _writer(db_name, stop_event):
+    """
+    Commits small write transactions to a scratch table until stopped, standing in for a running ETL load.
+    """
+    conn = sqlite3.connect(db_name, timeout=30)
+    conn.execute("CREATE TABLE IF NOT EXISTS LoadTestWrites (id INTEGER PRIMARY KEY, payload TEXT)")
+    conn.commit()
+    while not stop_event.is_set():
+        conn.executemany("INSERT INTO LoadTestWrites (payload) VALUES (?)", [('x' * 100,)] * 1000)
+        conn.commit()
+    conn.execute("DROP TABLE LoadTestWrites")
+    conn.commit()
+    conn.close()
+
+def run_clients(db_name, workload, n_clients, requests_per_client, use_cache):
+    """
+    Runs `n_clients` concurrent clients, each issuing random workload queries through
+    a pool of `n_clients` read-only connections. Returns per-request latencies in ms.
+    """
+    pool = open_read_only_pool(db_name, n_clients)
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def client(seed):
+        rng = random.Random(seed)
+        own = []
+        for _ in range(requests_per_client):
+            query = rng.choice(workload)
+            start = time.perf_counter()
+            run_pooled_query(pool, query, use_cache)
+            own.append((time.perf_counter() - start) * 1000)
+        with latencies_lock:
+            latencies.extend(own)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_clients) as executor:
+        list(executor.map(client, range(n_clients)))
+    elapsed = time.perf_counter() - start
+    close_pool(pool)
+    return np.array(latencies), elapsed
+
+def run_load_test(db_name=DB_NAME, client_counts=CLIENT_COUNTS, requests_per_client=REQUESTS_PER_CLIENT,
+                  use_cache=USE_CACHE, simulate_writer=SIMULATE_WRITER):
+    """
+    Measures OLAP query latency (p50/p99) and throughput for each concurrency level.
+    """
+    workload = build_workload(db_name)
+    print(f"Workload: {len(workload)} distinct queries, {requests_per_client} requests per client.")
+
+    stop_event = threading.Event()
+    writer = None
+    if simulate_writer:
+        writer = threading.Thread(target=_writer, args=(db_name, stop_event))
+        writer.start()
+
+    results = []
+    try:
+        for n_clients in client_counts:
+            latencies, elapsed = run_clients(db_name, workload, n_clients, requests_per_client, use_cache)
+            results.append({
+                'clients': n_clients,
+                'requests': len(latencies),
+                'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+                'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+                'queries_per_sec': round(len(latencies) / elapsed, 1),
+            })
+            print(f"{n_clients} clients done.")
+    finally:
+        stop_event.set()
+        if writer is not None:
+            writer.join()
+
+    results_df = pd.DataFrame(results)
+    print("\n--- OLAP Load Test ---")
+    print(results_df.to_markdown(index=False))
+    return results_df
+
+
+if __name__ == '__main__':
+    run_load_test()
@@ -0,0 +1,125 @@
+import sqlite3
+
+# --- Configuration ---
+# Aggregate tables and their grain, ordered from smallest to largest so the
+# router picks the cheapest table that can answer a query.
+# (country x year x month also carries quarter, so it can roll up to quarters.)
+AGGREGATE_GRAINS = {
+    'AggSalesCountryQuarter': ['country', 'year', 'quarter'],
+    'AggSalesCountryMonth': ['country', 'year', 'quarter', 'month'],
+    'AggSalesProductYear': ['product_id', 'year'],
+}
+
+# Where each grain column comes from in the star schema
+SOURCE_COLUMNS = {
+    'country': 'c.country',
+    'year': 't.year',
+    'quarter': 't.quarter',
+    'month': 't.month',
+    'product_id': 'f.product_id',
+}
+
+# Additive measures stored in every aggregate table
+MEASURES = {
+    'total_sales': 'SUM(f.sales_amount)',
+    'total_quantity': 'SUM(f.quantity)',
+    'row_count': 'COUNT(*)',
+}
+
+def has_aggregates(conn):
+    """
+    Returns True if the database contains every aggregate table
+    (as tables in SQLite, or as views over the Parquet export in DuckDB).
+    """
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')").fetchall()}
+    return all(table in names for table in AGGREGATE_GRAINS)
+
+def aggregates_ready(conn):
+    """
+    Returns True if every aggregate table exists and covers all of SalesFact, i.e. the
+    fact rows counted in each one (SUM(row_count)) match COUNT(*) of SalesFact.
+    Empty or stale aggregates (e.g. a database loaded before they existed) are not ready.
+    """
+    if not has_aggregates(conn):
+        return False
+    fact_rows = conn.execute("SELECT COUNT(*) FROM SalesFact").fetchone()[0]
+    for table in AGGREGATE_GRAINS:
+        if (conn.execute(f"SELECT COALESCE(SUM(row_count), 0) FROM {table}").fetchone()[0] or 0) != fact_rows:
+            print(f"WARNING: {table} does not match SalesFact. Run olap_aggregates.rebuild_aggregates() to refresh it.")
+            return False
+    return True
+
+def refresh_aggregates(conn, after_sales_id=0):
+    """
+    Folds the SalesFact rows with sales_id > `after_sales_id` into every aggregate table.
+    Only the newly loaded rows are read; existing aggregate rows are incremented in place.
+    Runs inside the caller's transaction, so aggregates commit together with the facts.
+    """
+    if not has_aggregates(conn):
+        print("WARNING: Aggregate tables not found. Re-run create_tables.py to enable them.")
+        return
+
+    for table, grain in AGGREGATE_GRAINS.items():
+        columns = grain + list(MEASURES)
+        # The WHERE clause is required by SQLite to parse INSERT ... SELECT ... ON CONFLICT
+        conn.execute(f"""
+        INSERT INTO {table} ({', '.join(columns)})
+        SELECT {', '.join(SOURCE_COLUMNS[col] for col in grain)}, {', '.join(MEASURES.values())}
+        FROM SalesFact f
+        JOIN TimeDim t ON f.time_id = t.time_id
+        JOIN CustomerDim c ON f.customer_id = c.customer_id
+        WHERE f.sales_id > ?
+        GROUP BY {', '.join(SOURCE_COLUMNS[col] for col in grain)}
+        ON CONFLICT({', '.join(grain)}) DO UPDATE SET
+            {', '.join(f'{measure} = {measure} + excluded.{measure}' for measure in MEASURES)};
+        """, (after_sales_id,))
+
+def rebuild_aggregates(db_name):
+    """
+    Recomputes every aggregate table from the full SalesFact history
+    (for databases loaded before the aggregate tables existed).
+    """
+    conn = sqlite3.connect(db_name)
+    for table in AGGREGATE_GRAINS:
+        conn.execute(f"DELETE FROM {table};")
+    refresh_aggregates(conn)
+    conn.commit()
+    conn.close()
+    print(f"Aggregate tables rebuilt in '{db_name}'.")
+
+def route_query(group_by, measures, filters=None, order_by=None, limit=None):
+    """
+    Builds SQL that answers a query from the smallest aggregate table whose grain
+    covers every grouping and filter column.
+    `filters` maps a column to a value (equality) or a list of values (IN).
+    Returns (sql, params), or None if only SalesFact can answer the query.
+    """
+    filters = filters or {}
+    needed = set(group_by) | set(filters)
+    if not set(measures) <= set(MEASURES):
+        return None
+    table = next((name for name, grain in AGGREGATE_GRAINS.items() if needed <= set(grain)), None)
+    if table is None:
+        return None
+
+    select = list(group_by) + [f"SUM({measure}) AS {measure}" for measure in measures]
+    sql = f"SELECT {', '.join(select)} FROM {table}"
+
+    conditions, params = [], []
+    for column, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            values = list(value)
+            conditions.append(f"{column} IN ({', '.join('?' * len(values))})" if values else "1 = 0")
+            params.extend(values)
+        else:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if group_by:
+        sql += f" GROUP BY {', '.join(group_by)}"
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    return sql, params
@@ -1,27 +1,60 @@
 import sqlite3
-import pandas as pd
-import matplotlib.pyplot as plt
+import json
 import os
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import pathname2url
+
+from create_tables import has_product_search, get_load_version
+from olap_aggregates import aggregates_ready, route_query
+from columnar_backend import read_sql, source_path
+from reporting import render, wait_for_plots, bar_plot
 
 # --- Configuration ---
 DB_NAME = 'retail_dw.db'
 OUTPUT_IMAGE = 'sales_by_country_visualization.png'
+QUERY_CACHE_SIZE = 256  # Number of query results kept in the LRU cache
+POOL_SIZE = 4           # Read-only connections used to run report queries concurrently
 
-def run_olap_analysis():
-    # 1. Connect to the Data Warehouse
-    if not os.path.exists(DB_NAME):
-        print(f"Error: Database '{DB_NAME}' not found. Please run the ETL script first.")
-        return
-
-    conn = sqlite3.connect(DB_NAME)
-    print("Connected to Data Warehouse. Running OLAP Queries...")
+# --- Cube Definition ---
+# Dimension attributes that can be grouped or filtered on, and where they live in the star schema
+DIMENSION_COLUMNS = {
+    'country': 'c.country',
+    'year': 't.year',
+    'quarter': 't.quarter',
+    'month': 't.month',
+    'date': 't.date',
+    'category': 'p.category',
+    'product_id': 'f.product_id',
+    'stock_code': 'p.stock_code',
+    'product_name': 'p.product_name',
+}
+TABLE_JOINS = {
+    'c': "JOIN CustomerDim c ON f.customer_id = c.customer_id",
+    't': "JOIN TimeDim t ON f.time_id = t.time_id",
+    'p': "JOIN ProductDim p ON f.product_id = p.product_id",
+}
+MEASURE_COLUMNS = {
+    'total_sales': 'SUM(f.sales_amount)',
+    'total_quantity': 'SUM(f.quantity)',
+    'row_count': 'COUNT(*)',
+    'invoice_count': 'COUNT(DISTINCT f.invoice_no)',
+}
+# Levels of each hierarchy, from coarsest to finest (used by roll_up / drill_down)
+HIERARCHIES = {
+    'time': ['year', 'quarter', 'month', 'date'],
+    'geography': ['country'],
+    'product': ['category', 'product_id'],
+}
+# Filter that matches products by a word in their name (full-text index when available)
+PRODUCT_SEARCH_FILTER = 'product_name_contains'
 
-    # =========================================================================
-    # QUERY 1: ROLL-UP (Simulated - Top 10)
-    # Goal: Total sales by Country and Quarter
-    # =========================================================================
-    print("\n--- Query 1: Roll-up Top 10 (Sales by Country and Quarter) ---")
-    sql_rollup = """
+# --- OLAP Queries ---
+OLAP_QUERIES = {
+    # ROLL-UP (Simulated - Top 10): Total sales by Country and Quarter
+    'rollup': """
     SELECT 
         c.country,
         t.year,
@@ -33,15 +66,9 @@ def run_olap_analysis():
     GROUP BY c.country, t.year, t.quarter
     ORDER BY total_sales DESC
     LIMIT 10;
-    """
-    df_rollup = pd.read_sql(sql_rollup, conn)
-    print(df_rollup.to_markdown(index=False))
-
-    # =========================================================================
-    # QUERY 2: DRILL-DOWN (Top 10 monthly sales for United Kingdom)
-    # =========================================================================
-    print("\n--- Query 2: Drill-down Top 10 (Monthly Sales for United Kingdom) ---")
-    sql_drilldown = """
+    """,
+    # DRILL-DOWN: Top 10 monthly sales for United Kingdom
+    'drilldown': """
     SELECT 
         t.year,
         t.month,
@@ -54,15 +81,31 @@ def run_olap_analysis():
     GROUP BY t.year, t.month
     ORDER BY total_sales DESC
     LIMIT 10;
-    """
-    df_drilldown = pd.read_sql(sql_drilldown, conn)
-    print(df_drilldown.to_markdown(index=False))
+    """,
+    # SLICE: Sales for 'SET' Products by Year, using the product-name full-text index
+    'slice': """
+    SELECT 
+        t.year,
+        SUM(f.sales_amount) as total_sales
+    FROM SalesFact f
+    JOIN TimeDim t ON f.time_id = t.time_id
+    WHERE f.product_id IN (SELECT rowid FROM ProductNameFTS WHERE ProductNameFTS MATCH 'SET')
+    GROUP BY t.year
+    ORDER BY t.year;
+    """,
+    # VISUALIZATION: Top 5 Countries by Sales
+    'top_countries': """
+    SELECT c.country, SUM(f.sales_amount) as total_sales
+    FROM SalesFact f
+    JOIN CustomerDim c ON f.customer_id = c.customer_id
+    GROUP BY c.country
+    ORDER BY total_sales DESC
+    LIMIT 5;
+    """,
+}
 
-    # =========================================================================
-    # QUERY 3: SLICE (Sales for 'SET' Products by Year - Proxy for Product Category Slice)
-    # =========================================================================
-    print("\n--- Query 3: Slice (Sales for 'SET' Products by Year) ---")
-    sql_slice = """
+# Slice used when the database has no ProductNameFTS index (substring scan of every product name)
+SLICE_LIKE_SQL = """
     SELECT 
         t.year,
         SUM(f.sales_amount) as total_sales
@@ -73,38 +116,320 @@ def run_olap_analysis():
     GROUP BY t.year
     ORDER BY t.year;
     """
-    df_slice = pd.read_sql(sql_slice, conn)
-    print(df_slice.to_markdown(index=False))
+
+def matching_product_ids(conn, term):
+    """
+    Returns the product_ids whose name contains the word `term`
+    (full-text index if available, otherwise a LIKE scan of ProductDim).
+    The term is quoted as an FTS5 phrase, so '-', quotes and other query syntax
+    in names such as 'T-LIGHT' are matched literally.
+    """
+    if has_product_search(conn):
+        phrase = '"' + term.replace('"', '""') + '"'
+        rows = conn.execute("SELECT rowid FROM ProductNameFTS WHERE ProductNameFTS MATCH ?", (phrase,)).fetchall()
+    else:
+        rows = conn.execute("SELECT product_id FROM ProductDim WHERE product_name LIKE ?", (f"%{term}%",)).fetchall()
+    return [row[0] for row in rows]
+
+# =========================================================================
+# OLAP QUERY ENGINE
+# A query is a plain dict: group_by (dimension attributes), measures,
+# filters (attribute -> value, or list of values for IN), order_by and limit.
+# =========================================================================
+
+def make_query(group_by, measures, filters=None, order_by=None, limit=None):
+    """
+    Builds and validates an OLAP query on the sales cube.
+    `order_by` is a grouped attribute or measure, optionally followed by ASC/DESC.
+    """
+    query = {
+        'group_by': list(group_by),
+        'measures': list(measures),
+        'filters': dict(filters or {}),
+        'order_by': order_by,
+        'limit': limit,
+    }
+    for column in query['group_by']:
+        if column not in DIMENSION_COLUMNS:
+            raise ValueError(f"Unknown dimension attribute '{column}'")
+    for measure in query['measures']:
+        if measure not in MEASURE_COLUMNS:
+            raise ValueError(f"Unknown measure '{measure}'")
+    for column in query['filters']:
+        if column not in DIMENSION_COLUMNS and column != PRODUCT_SEARCH_FILTER:
+            raise ValueError(f"Unknown filter attribute '{column}'")
+    if order_by is not None:
+        parts = order_by.split()
+        if (len(parts) not in (1, 2) or parts[0] not in query['group_by'] + query['measures']
+                or (len(parts) == 2 and parts[1].upper() not in ('ASC', 'DESC'))):
+            raise ValueError(f"Invalid order_by '{order_by}'")
+    if limit is not None and int(limit) < 1:
+        raise ValueError("limit must be a positive integer")
+    return query
+
+def _hierarchy_of(column):
+    """
+    Returns the level list of the hierarchy containing `column` (None if it has none).
+    """
+    return next((levels for levels in HIERARCHIES.values() if column in levels), None)
+
+def roll_up(query, column):
+    """
+    ROLL-UP: replaces `column` with its parent level (e.g. month -> quarter),
+    or removes it when it is already the top level of its hierarchy.
+    """
+    levels = _hierarchy_of(column) or [column]
+    position = levels.index(column)
+    group_by = [col for col in query['group_by'] if col != column]
+    if position > 0 and levels[position - 1] not in group_by:
+        group_by.insert(query['group_by'].index(column), levels[position - 1])
+    return make_query(group_by, query['measures'], query['filters'], _order_by_if_valid(query, group_by), query['limit'])
+
+def drill_down(query, column):
+    """
+    DRILL-DOWN: adds the child level of `column` (e.g. quarter -> month) to the grouping.
+    """
+    levels = _hierarchy_of(column)
+    if levels is None or levels.index(column) == len(levels) - 1:
+        raise ValueError(f"'{column}' has no finer level to drill down to")
+    child = levels[levels.index(column) + 1]
+    group_by = list(query['group_by'])
+    if column in group_by:
+        group_by.insert(group_by.index(column) + 1, child)
+    else:
+        group_by.append(child)
+    return make_query(group_by, query['measures'], query['filters'], query['order_by'], query['limit'])
+
+def slice_cube(query, column, value):
+    """
+    SLICE: fixes one dimension attribute to a single value.
+    """
+    return make_query(query['group_by'], query['measures'], {**query['filters'], column: value},
+                      query['order_by'], query['limit'])
+
+def dice_cube(query, filters):
+    """
+    DICE: restricts several dimension attributes to lists of values.
+    """
+    return make_query(query['group_by'], query['measures'], {**query['filters'], **filters},
+                      query['order_by'], query['limit'])
+
+def _order_by_if_valid(query, group_by):
+    """
+    Keeps the query's ordering unless it refers to an attribute that was rolled away.
+    """
+    order_by = query['order_by']
+    if order_by and order_by.split()[0] not in group_by + query['measures']:
+        return None
+    return order_by
+
+def build_star_sql(query):
+    """
+    Generates the star-schema SQL (and its parameters) for a query, joining only
+    the dimension tables it needs.
+    """
+    conditions, params = [], []
+    for column, value in query['filters'].items():
+        expression = DIMENSION_COLUMNS[column]
+        if isinstance(value, (list, tuple, set)):
+            values = list(value)
+            conditions.append(f"{expression} IN ({', '.join('?' * len(values))})" if values else "1 = 0")
+            params.extend(values)
+        else:
+            conditions.append(f"{expression} = ?")
+            params.append(value)
+
+    used = [DIMENSION_COLUMNS[col] for col in query['group_by'] + list(query['filters'])]
+    joins = [join for alias, join in TABLE_JOINS.items() if any(expr.startswith(f"{alias}.") for expr in used)]
+
+    select = [f"{DIMENSION_COLUMNS[col]} AS {col}" for col in query['group_by']]
+    select += [f"{MEASURE_COLUMNS[measure]} AS {measure}" for measure in query['measures']]
+    sql = f"SELECT {', '.join(select)} FROM SalesFact f"
+    if joins:
+        sql += " " + " ".join(joins)
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if query['group_by']:
+        sql += f" GROUP BY {', '.join(DIMENSION_COLUMNS[col] for col in query['group_by'])}"
+    if query['order_by']:
+        sql += f" ORDER BY {query['order_by']}"
+    if query['limit'] is not None:
+        sql += f" LIMIT {int(query['limit'])}"
+    return sql, params
+
+def _normalize(query):
+    """
+    Canonical text form of a query, so equivalent queries share a cache entry.
+    """
+    filters = {
+        column: sorted(value) if isinstance(value, (list, tuple, set)) else value
+        for column, value in query['filters'].items()
+    }
+    order_by = ' '.join(query['order_by'].split()).upper() if query['order_by'] else None
+    return json.dumps([query['group_by'], query['measures'], sorted(filters.items()), order_by, query['limit']],
+                      default=str)
+
+_query_cache = OrderedDict()
+_query_cache_stats = {'hits': 0, 'misses': 0}
+_query_cache_lock = threading.Lock()  # run_query is called from several threads
+
+def clear_query_cache():
+    """
+    Empties the OLAP result cache.
+    """
+    with _query_cache_lock:
+        _query_cache.clear()
+        _query_cache_stats.update(hits=0, misses=0)
+
+def query_cache_info():
+    """
+    Returns the cache hit/miss counts and current size.
+    """
+    return {**_query_cache_stats, 'size': len(_query_cache), 'max_size': QUERY_CACHE_SIZE}
+
+def run_query(conn, query, use_cache=True):
+    """
+    Runs an OLAP query on a SQLite or DuckDB (Parquet) connection, answering it from the
+    smallest aggregate table that can serve it (once the aggregates cover all of SalesFact)
+    and otherwise from the star schema. Results are kept in an LRU cache keyed by the
+    data source (database file or Parquet export), the normalized query and the warehouse load version, so a new ETL load
+    invalidates them.
+    """
+    cache_key = (source_path(conn), get_load_version(conn), _normalize(query))
+    if use_cache:
+        with _query_cache_lock:
+            if cache_key in _query_cache:
+                _query_cache.move_to_end(cache_key)
+                _query_cache_stats['hits'] += 1
+                return _query_cache[cache_key].copy()
+            _query_cache_stats['misses'] += 1
+
+    filters = dict(query['filters'])
+    if PRODUCT_SEARCH_FILTER in filters:
+        product_ids = matching_product_ids(conn, filters.pop(PRODUCT_SEARCH_FILTER))
+        if 'product_id' in filters:
+            requested = filters['product_id']
+            requested = set(requested) if isinstance(requested, (list, tuple, set)) else {requested}
+            product_ids = [product_id for product_id in product_ids if product_id in requested]
+        filters['product_id'] = product_ids
+    resolved = {**query, 'filters': filters}
+
+    routed = route_query(resolved['group_by'], resolved['measures'], filters,
+                         resolved['order_by'], resolved['limit'])
+    if routed is not None and not aggregates_ready(conn):
+        routed = None
+    sql, params = routed if routed is not None else build_star_sql(resolved)
+    result = read_sql(conn, sql, params)
+
+    if use_cache:
+        with _query_cache_lock:
+            _query_cache[cache_key] = result
+            if len(_query_cache) > QUERY_CACHE_SIZE:
+                _query_cache.popitem(last=False)
+    return result.copy()
+
+# =========================================================================
+# CONCURRENT EXECUTION
+# Read-only connections (mode=ro) never take write locks, and with the ETL's
+# WAL journal they keep reading a consistent snapshot while a load is running.
+# =========================================================================
+
+def open_read_only_pool(db_name, size=POOL_SIZE):
+    """
+    Opens `size` read-only connections to `db_name` and returns them in a queue used as a pool.
+    """
+    uri = f"file:{pathname2url(os.path.abspath(db_name))}?mode=ro"
+    pool = queue.Queue()
+    for _ in range(size):
+        pool.put(sqlite3.connect(uri, uri=True, check_same_thread=False))
+    return pool
+
+def close_pool(pool):
+    """
+    Closes every connection in the pool.
+    """
+    while not pool.empty():
+        pool.get_nowait().close()
+
+def run_pooled_query(pool, query, use_cache=True):
+    """
+    Runs one query on a connection borrowed from the pool (blocking until one is free).
+    """
+    conn = pool.get()
+    try:
+        return run_query(conn, query, use_cache)
+    finally:
+        pool.put(conn)
+
+def run_queries_concurrently(pool, queries, max_workers=None, use_cache=True):
+    """
+    Runs independent OLAP queries (name -> query) in a thread pool, one pooled
+    connection per running query. Returns name -> result in the input order.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers or pool.qsize()) as executor:
+        futures = {name: executor.submit(run_pooled_query, pool, query, use_cache) for name, query in queries.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+def run_olap_analysis(country='United Kingdom', product_term='SET', top_n=10, top_countries=5):
+    """
+    Runs the standard OLAP report (roll-up, drill-down, slice and top-countries chart)
+    through the query engine. The drill-down country and slice product term are parameters.
+    """
+    # 1. Connect to the Data Warehouse
+    if not os.path.exists(DB_NAME):
+        print(f"Error: Database '{DB_NAME}' not found. Please run the ETL script first.")
+        return
+
+    pool = open_read_only_pool(DB_NAME)
+    print("Connected to Data Warehouse. Running OLAP Queries...")
+
+    # The report queries are independent, so they run concurrently on the pool
+    queries = {
+        # ROLL-UP (Simulated - Top N): Total sales by Country and Quarter
+        'rollup': make_query(['country', 'year', 'quarter'], ['total_sales'],
+                             order_by='total_sales DESC', limit=top_n),
+        # DRILL-DOWN: Top N monthly sales for one country
+        'drilldown': slice_cube(
+            make_query(['year', 'month'], ['total_sales', 'total_quantity'], order_by='total_sales DESC', limit=top_n),
+            'country', country
+        ),
+        # SLICE: Sales for one product term by Year (proxy for a product category slice)
+        'slice': make_query(['year'], ['total_sales'], {PRODUCT_SEARCH_FILTER: product_term}, order_by='year'),
+        # VISUALIZATION: Top countries by sales
+        'top_countries': make_query(['country'], ['total_sales'], order_by='total_sales DESC', limit=top_countries),
+    }
+    results = run_queries_concurrently(pool, queries)
+    close_pool(pool)
+
+    # =========================================================================
+    # QUERY 1: ROLL-UP (Simulated - Top N)
+    # Goal: Total sales by Country and Quarter
+    # =========================================================================
+    print(f"\n--- Query 1: Roll-up Top {top_n} (Sales by Country and Quarter) ---")
+    print(results['rollup'].to_markdown(index=False))
+
+    # =========================================================================
+    # QUERY 2: DRILL-DOWN (Top N monthly sales for one country)
+    # =========================================================================
+    print(f"\n--- Query 2: Drill-down Top {top_n} (Monthly Sales for {country}) ---")
+    print(results['drilldown'].to_markdown(index=False))
+
+    # =========================================================================
+    # QUERY 3: SLICE (Sales for one product term by Year - Proxy for Product Category Slice)
+    # =========================================================================
+    print(f"\n--- Query 3: Slice (Sales for '{product_term}' Products by Year) ---")
+    print(results['slice'].to_markdown(index=False))
 
     # =========================================================================
     # VISUALIZATION
     # Goal: Bar chart of Top 5 Countries by Sales
     # =========================================================================
     print("\n--- Generating Visualization ---")
-    
-    sql_viz = """
-    SELECT c.country, SUM(f.sales_amount) as total_sales
-    FROM SalesFact f
-    JOIN CustomerDim c ON f.customer_id = c.customer_id
-    GROUP BY c.country
-    ORDER BY total_sales DESC
-    LIMIT 5;
-    """
-    df_viz = pd.read_sql(sql_viz, conn)
-
-    plt.figure(figsize=(10, 6))
-    plt.bar(df_viz['country'], df_viz['total_sales'], color='skyblue')
-    plt.title('Top 5 Countries by Total Sales')
-    plt.xlabel('Country')
-    plt.ylabel('Total Sales ($)')
-    plt.xticks(rotation=45)
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    
-    plt.savefig(OUTPUT_IMAGE)
-    print(f"Visualization saved as '{OUTPUT_IMAGE}'")
-
-    conn.close()
+    df_viz = results['top_countries']
+
+    render(bar_plot, OUTPUT_IMAGE, df_viz['country'].tolist(), df_viz['total_sales'].tolist(),
+           f'Top {top_countries} Countries by Total Sales', 'Country', 'Total Sales ($)')
+    wait_for_plots()
 
 if __name__ == "__main__":
     run_olap_analysis()
\ No newline at end of file
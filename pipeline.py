@@ -0,0 +1,372 @@
+import os
+import ast
+import json
+import time
+import hashlib
+import sqlite3
+import multiprocessing
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import create_tables
+import etl_process
+import rfm_feature_engineering
+import rfm_k_selection
+import rfm_segment_model
+import rfm_clustering
+import rfm_segment_naming
+import rfm_segment_profiling
+import classifier_selection
+import segment_scoring
+import classification
+import association_rules
+import rule_index
+import reporting
+from create_tables import get_load_version
+
+# --- Configuration ---
+DB_NAME = 'retail_dw.db'
+STATE_FILE = 'pipeline_state.json'  # Fingerprints of the last successful run of every stage
+MAX_WORKERS = 2                     # Independent stages run at the same time (1 runs them one by one)
+FORCE = False                       # Rerun every stage even when its inputs are unchanged
+TARGETS = None                      # Stage names to bring up to date (None = all); their upstream stages are included
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Warehouse artifacts, fingerprinted from the database instead of by file content
+DB_SCHEMA = 'db:schema'  # Table/index definitions
+DB_DATA = 'db:data'      # Latest ETL load (EtlLoadLog)
+
+SCHEMA_SQL = """
+    SELECT group_concat(sql, ';') FROM (
+        SELECT sql FROM sqlite_master
+        WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+        ORDER BY name
+    )
+"""
+
+def _create_warehouse():
+    create_tables.create_tables(DB_NAME)
+    create_tables.create_analytical_indexes(DB_NAME)
+
+def _load_warehouse():
+    if not os.path.exists(etl_process.DATA_FILE):
+        raise FileNotFoundError(f"ETL source file not found at '{etl_process.DATA_FILE}'.")
+    etl_process.run_etl(etl_process.DATA_FILE, etl_process.SHEET_NAME, DB_NAME,
+                        etl_process.LOAD_MODE, etl_process.CHUNK_SIZE)
+
+def _engineer_features():
+    rfm_feature_engineering.calculate_rfm(DB_NAME, rfm_feature_engineering.OUTPUT_FILE,
+                                          rfm_feature_engineering.BACKEND, rfm_feature_engineering.PARQUET_DIR,
+                                          rfm_feature_engineering.SNAPSHOT_DATE)
+
+def _cluster_customers():
+    if rfm_clustering.CHUNK_SIZE:
+        rfm_clustering.perform_streaming_clustering(rfm_clustering.INPUT_FILE, rfm_clustering.OUTPUT_MODEL_FILE,
+                                                    rfm_clustering.CHUNK_SIZE)
+    else:
+        rfm_clustering.perform_clustering(rfm_clustering.INPUT_FILE, rfm_clustering.OUTPUT_SCALED_FILE,
+                                          rfm_clustering.OUTPUT_MODEL_FILE)
+
+def _profile_segments():
+    rfm_segment_profiling.profile_segments(rfm_segment_profiling.INPUT_FILE)
+
+def _classify_segments():
+    classification.perform_classification(classification.INPUT_FILE)
+
+def _mine_rules():
+    association_rules.run_association_mining(DB_NAME)
+
+# Each stage declares the stages it depends on, the artifacts it reads and writes,
+# the configuration constants that change its result, and the modules whose code it
+# runs (the repository modules those import are fingerprinted too, see code_files).
+STAGES = {
+    'create_tables': {
+        'run': _create_warehouse, 'deps': [],
+        'inputs': [], 'outputs': [DB_SCHEMA],
+        'params': [], 'code': [create_tables],
+    },
+    'etl': {
+        'run': _load_warehouse, 'deps': ['create_tables'],
+        'inputs': [DB_SCHEMA, etl_process.DATA_FILE], 'outputs': [DB_DATA],
+        'params': [(etl_process, ('SHEET_NAME', 'LOAD_MODE', 'CHUNK_SIZE'))],
+        'code': [etl_process],
+    },
+    'rfm_features': {
+        'run': _engineer_features, 'deps': ['etl'],
+        'inputs': [DB_DATA], 'outputs': [rfm_feature_engineering.OUTPUT_FILE],
+        'params': [(rfm_feature_engineering, ('BACKEND', 'SNAPSHOT_DATE', 'USE_FEATURE_STORE'))],
+        'code': [rfm_feature_engineering],
+    },
+    'clustering': {
+        'run': _cluster_customers, 'deps': ['rfm_features'],
+        'inputs': [rfm_clustering.INPUT_FILE], 'outputs': [rfm_clustering.OUTPUT_MODEL_FILE],
+        'params': [(rfm_clustering, ('REFIT', 'CHUNK_SIZE', 'STREAM_EPOCHS')),
+                   (rfm_k_selection, ('K_RANGE', 'ALGORITHM', 'SELECTION_METHOD', 'SWEEP_SAMPLE_SIZE',
+                                      'EARLY_STOP_TOL', 'EARLY_STOP_PATIENCE', 'RANDOM_STATE')),
+                   (rfm_segment_model, ('DRIFT_DISTANCE_RATIO', 'DRIFT_MEAN_SHIFT'))],
+        'code': [rfm_clustering, rfm_k_selection, rfm_segment_model],
+    },
+    'profiling': {
+        'run': _profile_segments, 'deps': ['clustering'],
+        'inputs': [rfm_segment_profiling.INPUT_FILE], 'outputs': [rfm_segment_profiling.PROFILE_FILE],
+        'params': [(rfm_segment_profiling, ('PROFILE_PERCENTILES',)),
+                   (rfm_segment_naming, ('MATCH_TOLERANCE',)), (reporting, ('PLOTS_ENABLED',))],
+        'code': [rfm_segment_profiling, rfm_segment_naming],
+    },
+    'classification': {
+        'run': _classify_segments, 'deps': ['clustering'],
+        'inputs': [classification.INPUT_FILE], 'outputs': [segment_scoring.MODEL_FILE],
+        'params': [(classification, ('TARGET_COLUMN', 'SAVE_MODELS', 'TUNE_HYPERPARAMETERS')),
+                   (classifier_selection, ('CV_FOLDS', 'KNN_K_RANGE', 'KNN_METRICS', 'TREE_DEPTHS', 'RANDOM_STATE')),
+                   (reporting, ('PLOTS_ENABLED',))],
+        'code': [classification, classifier_selection, segment_scoring],
+    },
+    'association_rules': {
+        'run': _mine_rules, 'deps': ['etl'],
+        'inputs': [DB_DATA], 'outputs': [],
+        'params': [(association_rules, ('MIN_SUPPORT', 'MIN_CONFIDENCE', 'MAX_ITEMSET_SIZE', 'PARTITION_BY', 'SAVE_RULES'))],
+        'code': [association_rules, rule_index],
+    },
+}
+
+def topological_order(stages=STAGES, targets=None):
+    """
+    Returns the stage names in dependency order, restricted to `targets` and
+    everything they depend on. Raises ValueError on unknown stages or cycles.
+    """
+    order, visiting = [], set()
+
+    def visit(name):
+        if name not in stages:
+            raise ValueError(f"Unknown pipeline stage '{name}'.")
+        if name in order:
+            return
+        if name in visiting:
+            raise ValueError(f"Pipeline stages form a cycle through '{name}'.")
+        visiting.add(name)
+        for dep in stages[name]['deps']:
+            visit(dep)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in (targets or stages):
+        visit(name)
+    return order
+
+def _file_hash(path, hash_cache):
+    """
+    Returns the SHA-256 of a file. Hashes are cached by (size, mtime), so
+    unchanged files are not re-read on every run.
+    """
+    stat = os.stat(path)
+    cached = hash_cache.get(path)
+    if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    hash_cache[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+    return digest.hexdigest()
+
+def _local_imports(path):
+    """
+    Returns the source files of the repository modules imported by a module,
+    at the top level or inside functions (imports under `if __name__ == '__main__'`
+    only run as a script and are left out).
+    """
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    names = set()
+    for statement in tree.body:
+        if isinstance(statement, ast.If) and '__main__' in ast.unparse(statement.test):
+            continue
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Import):
+                names.update(alias.name.split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names.add(node.module.split('.')[0])
+    paths = (os.path.join(REPO_DIR, f"{name}.py") for name in names)
+    return [path for path in paths if os.path.exists(path)]
+
+def code_files(modules):
+    """
+    Returns the source files of `modules` and of every repository module they
+    import, directly or indirectly, so a change to any of them invalidates the stage.
+    """
+    pending, files = [os.path.abspath(module.__file__) for module in modules], set()
+    while pending:
+        path = pending.pop()
+        if path not in files:
+            files.add(path)
+            pending.extend(_local_imports(path))
+    return sorted(files)
+
+def artifact_fingerprint(artifact, hash_cache):
+    """
+    Returns the current fingerprint of an artifact (None if it doesn't exist):
+    the load version or schema hash for the warehouse, the content hash for files.
+    A warehouse with no ETL load recorded has no data artifact.
+    """
+    if artifact in (DB_SCHEMA, DB_DATA):
+        if not os.path.exists(DB_NAME):
+            return None
+        conn = sqlite3.connect(DB_NAME)
+        try:
+            if artifact == DB_DATA:
+                version = get_load_version(conn)
+                return None if version == 'empty' else version
+            schema = conn.execute(SCHEMA_SQL).fetchone()[0]
+            return hashlib.sha256((schema or '').encode()).hexdigest() if schema else None
+        finally:
+            conn.close()
+    if not os.path.exists(artifact):
+        return None
+    return _file_hash(artifact, hash_cache)
+
+def stage_fingerprint(name, hash_cache):
+    """
+    Fingerprints everything a stage's result depends on: its input artifacts,
+    its configuration constants and the code it runs.
+    """
+    stage = STAGES[name]
+    inputs = {artifact: artifact_fingerprint(artifact, hash_cache) for artifact in stage['inputs']}
+    params = {f"{module.__name__}.{param}": repr(getattr(module, param))
+              for module, names in stage['params'] for param in names}
+    code = {os.path.relpath(path, REPO_DIR): _file_hash(path, hash_cache) for path in code_files(stage['code'])}
+    return hashlib.sha256(json.dumps([inputs, params, code], sort_keys=True).encode()).hexdigest()
+
+def load_state(state_file=STATE_FILE):
+    """
+    Returns the saved pipeline state (empty on the first run).
+    """
+    if not os.path.exists(state_file):
+        return {'stages': {}, 'file_hashes': {}}
+    with open(state_file) as f:
+        return json.load(f)
+
+def save_state(state, state_file=STATE_FILE):
+    """
+    Writes the pipeline state atomically (a crash never leaves a torn state file).
+    """
+    temp_file = f"{state_file}.tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_file, state_file)
+
+def _is_current(name, fingerprint, state):
+    """
+    A stage can be skipped when its fingerprint matches the last successful run
+    and its outputs are still exactly what that run produced.
+    """
+    previous = state['stages'].get(name)
+    if previous is None or previous['fingerprint'] != fingerprint:
+        return False
+    hash_cache = state['file_hashes']
+    return all(artifact_fingerprint(artifact, hash_cache) == recorded
+               for artifact, recorded in previous['outputs'].items())
+
+def _execute(name):
+    """
+    Runs one stage and returns the elapsed seconds. A stage that raises before
+    collecting its plots would leave the render pool running, so it is always
+    shut down afterwards.
+    """
+    start = time.perf_counter()
+    try:
+        STAGES[name]['run']()
+    finally:
+        reporting.cancel_plots()
+    return time.perf_counter() - start
+
+def _execute_in_worker(name):
+    """
+    Runs one stage in a pipeline worker process. A worker can't exit while it
+    has live child processes, so any a failed stage left behind (e.g. an
+    executor it never shut down) are terminated; otherwise shutting the
+    pipeline pool down would wait on them forever.
+    """
+    try:
+        return _execute(name)
+    finally:
+        for child in multiprocessing.active_children():
+            child.terminate()
+            child.join()
+
+def run_pipeline(targets=TARGETS, force=FORCE, max_workers=MAX_WORKERS, state_file=STATE_FILE):
+    """
+    Brings the pipeline up to date: stages run in dependency order, independent
+    stages (e.g. profiling and classification) run in parallel, and a stage whose
+    fingerprint and outputs are unchanged since its last successful run is skipped.
+    Stages downstream of a failed stage are not run.
+    Returns a DataFrame with the status and duration of every stage.
+    """
+    order = topological_order(STAGES, targets)
+    state = load_state(state_file)
+    hash_cache = state['file_hashes']
+    status, seconds = {}, {}
+    pending, running = list(order), {}
+    pool = ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+
+    def finish(name, fingerprint, outcome):
+        try:
+            seconds[name] = round(outcome(), 2)
+        except Exception as e:
+            print(f"ERROR: Pipeline stage '{name}' failed: {e}")
+            status[name] = 'failed'
+            return
+        outputs = {artifact: artifact_fingerprint(artifact, hash_cache) for artifact in STAGES[name]['outputs']}
+        missing = [artifact for artifact, value in outputs.items() if value is None]
+        if missing:
+            # Stages report their own errors and return; a missing output means the stage did not complete
+            print(f"ERROR: Pipeline stage '{name}' did not produce {missing}.")
+            status[name] = 'failed'
+            return
+        status[name] = 'ran'
+        state['stages'][name] = {'fingerprint': fingerprint, 'outputs': outputs, 'seconds': seconds[name]}
+        save_state(state, state_file)
+
+    try:
+        while pending or running:
+            for name in list(pending):
+                deps = STAGES[name]['deps']
+                if any(status.get(dep) in ('failed', 'blocked') for dep in deps):
+                    pending.remove(name)
+                    status[name] = 'blocked'
+                    print(f"[pipeline] {name}: blocked by a failed upstream stage")
+                    continue
+                if not all(status.get(dep) in ('ran', 'skipped') for dep in deps):
+                    continue
+                pending.remove(name)
+                # Fingerprinted only once its upstream stages are done, so it sees their fresh outputs
+                fingerprint = stage_fingerprint(name, hash_cache)
+                if not force and _is_current(name, fingerprint, state):
+                    status[name] = 'skipped'
+                    print(f"[pipeline] {name}: up to date")
+                    continue
+                print(f"[pipeline] {name}: running")
+                if pool is None:
+                    finish(name, fingerprint, lambda: _execute(name))
+                else:
+                    running[pool.submit(_execute_in_worker, name)] = (name, fingerprint)
+
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, fingerprint = running.pop(future)
+                    finish(name, fingerprint, future.result)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        save_state(state, state_file)
+
+    summary = pd.DataFrame({'stage': order, 'status': [status.get(name) for name in order],
+                            'seconds': [seconds.get(name) for name in order]})
+    print("\n--- Pipeline Summary ---")
+    print(summary.to_markdown(index=False))
+    return summary
+
+
+if __name__ == '__main__':
+    run_pipeline()
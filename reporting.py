@@ -0,0 +1,144 @@
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Headless: reports are only ever written to files
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from sklearn.tree import plot_tree
+from concurrent.futures import ProcessPoolExecutor
+
+# --- Configuration ---
+PLOTS_ENABLED = True   # Set to False for batch runs that only need the analytics output
+RENDER_WORKERS = 2     # Processes rendering plots in the background (0 renders inline)
+TREE_PLOT_DEPTH = 3    # Decision tree levels drawn (the fitted tree itself is not pruned)
+DPI = 100
+BOX_PERCENTILES = (0.05, 0.25, 0.5, 0.75, 0.95)  # Lower whisker, box, median, box, upper whisker
+
+_pool = None
+_pending = []
+
+def _new_figure(figsize):
+    """
+    Returns a Figure with its own Agg canvas (no pyplot global state).
+    """
+    figure = Figure(figsize=figsize, dpi=DPI)
+    FigureCanvasAgg(figure)
+    return figure
+
+def _save(figure, path):
+    """
+    Writes the figure to `path` and returns the path.
+    """
+    figure.tight_layout()
+    figure.savefig(path)
+    return path
+
+def line_plot(path, x, y, title, xlabel, ylabel):
+    """
+    Renders a line plot with point markers (e.g. the elbow curve).
+    """
+    figure = _new_figure((8, 5))
+    ax = figure.add_subplot()
+    ax.plot(x, y, marker='o')
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.grid(True)
+    return _save(figure, path)
+
+def bar_plot(path, labels, values, title, xlabel, ylabel):
+    """
+    Renders a bar chart.
+    """
+    figure = _new_figure((10, 6))
+    ax = figure.add_subplot()
+    ax.bar(labels, values, color='skyblue')
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    return _save(figure, path)
+
+def quantile_column(metric, percentile):
+    """
+    Returns the summary column holding a metric's quantile (0.05 -> '<metric>_p5').
+    """
+    return f"{metric}_p{percentile * 100:g}"
+
+def quantile_boxplots(path, summary, metrics, group_label, percentiles=BOX_PERCENTILES):
+    """
+    Renders one boxplot panel per metric from precomputed quantiles instead of
+    raw points. `summary` is indexed by group with a quantile_column for each of
+    the five `percentiles` (lower whisker, box low, median, box high, upper
+    whisker); `metrics` maps metric to title.
+    """
+    figure = _new_figure((15, 6))
+    for i, (metric, title) in enumerate(metrics.items()):
+        ax = figure.add_subplot(1, len(metrics), i + 1)
+        whislo, q1, med, q3, whishi = (quantile_column(metric, percentile) for percentile in percentiles)
+        boxes = [{
+            'label': str(group),
+            'whislo': row[whislo], 'q1': row[q1], 'med': row[med],
+            'q3': row[q3], 'whishi': row[whishi], 'fliers': [],
+        } for group, row in summary.iterrows()]
+        artists = ax.bxp(boxes, showfliers=False, patch_artist=True, medianprops={'color': 'black'})
+        colors = matplotlib.colormaps['viridis'](np.linspace(0.2, 0.9, len(boxes)))
+        for patch, color in zip(artists['boxes'], colors):
+            patch.set_facecolor(color)
+        ax.set_title(f'{group_label}s by {title}', fontsize=14)
+        ax.set_xlabel(group_label, fontsize=12)
+        ax.set_ylabel(title, fontsize=12)
+        ax.tick_params(axis='x', labelrotation=45)
+    return _save(figure, path)
+
+def decision_tree_plot(path, model, feature_names, class_names, title, max_depth=TREE_PLOT_DEPTH):
+    """
+    Renders the top `max_depth` levels of a fitted decision tree.
+    """
+    figure = _new_figure((15, 10))
+    ax = figure.add_subplot()
+    plot_tree(model, max_depth=max_depth, filled=True, feature_names=feature_names,
+              class_names=class_names, rounded=True, ax=ax)
+    ax.set_title(title)
+    return _save(figure, path)
+
+def render(plot, *args, **kwargs):
+    """
+    Schedules a plot function on the render pool (or renders it inline when
+    RENDER_WORKERS is 0). Does nothing when plots are disabled.
+    Call wait_for_plots() to collect the results.
+    """
+    global _pool
+    if not PLOTS_ENABLED:
+        return None
+    if RENDER_WORKERS == 0:
+        print(f"Plot saved as '{plot(*args, **kwargs)}'")
+        return None
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS)
+    future = _pool.submit(plot, *args, **kwargs)
+    _pending.append(future)
+    return future
+
+def wait_for_plots():
+    """
+    Waits for all scheduled plots and reports the files written.
+    Shuts the render pool down even when a plot fails (the error is re-raised).
+    """
+    try:
+        while _pending:
+            print(f"Plot saved as '{_pending.pop(0).result()}'")
+    finally:
+        cancel_plots()
+
+def cancel_plots():
+    """
+    Drops the plots not yet rendered and shuts the render pool down (a plot
+    already rendering is finished first). Called by wait_for_plots, and by the
+    pipeline after a stage that failed before collecting its plots.
+    """
+    global _pool
+    _pending.clear()
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
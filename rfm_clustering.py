@@ -1,35 +1,58 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
 import os
-import numpy as np # Added numpy for log transformation
+import numpy as np
+
+from rfm_k_selection import (
+    K_RANGE, N_JOBS, ALGORITHM, SELECTION_METHOD, SWEEP_SAMPLE_SIZE, MINIBATCH_BATCH_SIZE, RANDOM_STATE,
+    select_k, resolve_algorithm, make_kmeans
+)
+from rfm_segment_model import (
+    MODEL_FILE, FEATURE_COLUMNS, log_transform, build_segment_model, set_drift_baseline, save_segment_model,
+    load_segment_model, scale_features, nearest_centroids, assign_segments, check_drift, selection_config,
+    selection_changed
+)
+from reporting import render, wait_for_plots, line_plot
+from artifact_io import read_table, write_table, read_table_chunks, write_table_chunks
 
 # --- Configuration ---
-INPUT_FILE = 'rfm_features.csv'
-OUTPUT_SCALED_FILE = 'rfm_scaled_features.csv'
-OUTPUT_MODEL_FILE = 'rfm_clusters_with_scores.csv'
+# Stage artifacts are Feather files read through memory maps (see artifact_io.py); '.csv' paths also work
+INPUT_FILE = 'rfm_features.feather'
+OUTPUT_SCALED_FILE = 'rfm_scaled_features.feather'
+OUTPUT_MODEL_FILE = 'rfm_clusters_with_scores.feather'
+REFIT = 'auto'  # 'auto' reuses the saved segment model unless the customer base has drifted; 'always' refits
+# Set to a row count (e.g. 100000) to cluster out of core, reading the feature file in chunks of this size
+CHUNK_SIZE = None
+STREAM_EPOCHS = 3  # Mini-batch passes over the feature file in streaming mode
 
-# Define a function to automatically estimate K by looking for the elbow point
-def estimate_optimal_k(sse_dict):
+def _save_scaled_features(X_scaled, scaled_output):
     """
-    Estimates the optimal number of clusters K based on the SSE dictionary
-    by finding the point of maximum curvature (the 'elbow').
-    If calculation is difficult, it defaults to a common value (4).
+    Writes the scaled RFM features used for clustering.
     """
-    # Simple heuristic: look for the largest drop in SSE per additional K,
-    # or rely on standard retail segmentation sizes.
-    
-    # In a real scenario, this involves analyzing the elbow plot.
-    # For this exercise, we will default to K=4, a standard size for RFM segmentation,
-    # unless a visual inspection confirms otherwise.
-    return 4 
+    rfm_scaled_df = pd.DataFrame(X_scaled, columns=['recency_scaled', 'frequency_scaled', 'monetary_scaled'])
+    write_table(rfm_scaled_df, scaled_output)
+    print(f"Scaled features saved to: {scaled_output}")
 
+def _save_results(rfm_df, model_output):
+    """
+    Writes the customer segmentation and prints a sample.
+    """
+    final_results = rfm_df[['customer_id', 'recency', 'frequency', 'monetary', 'Cluster']]
+    write_table(final_results, model_output)
+    
+    print("\n--- K-Means Clustering Complete ---")
+    print(f"Final customer segmentation saved to: {model_output}")
+    print("\nSample Clustered Data:")
+    print(final_results.head().to_markdown(index=False))
 
-def perform_clustering(input_file, scaled_output, model_output):
+def perform_clustering(input_file, scaled_output, model_output, k_range=K_RANGE, n_jobs=N_JOBS,
+                       algorithm=ALGORITHM, selection_method=SELECTION_METHOD, model_file=MODEL_FILE, refit=REFIT):
     """
-    Scales RFM data, finds the optimal K using the Elbow method plot, 
-    and applies K-Means clustering.
+    Scales RFM data, selects K automatically from a parallel sweep of candidate
+    values (see rfm_k_selection.select_k), plots the elbow, and applies K-Means clustering.
+    The fitted log/scaler/centroid model is saved to `model_file`; later runs assign
+    customers to the saved centroids and only refit when the drift check fails or the
+    model was fitted with a different `k_range`, `algorithm` or `selection_method`.
     """
     if not os.path.exists(input_file):
         print(f"ERROR: RFM feature file not found at '{input_file}'.")
@@ -37,7 +60,7 @@ def perform_clustering(input_file, scaled_output, model_output):
         return
 
     # 1. Load Data
-    rfm_df = pd.read_csv(input_file)
+    rfm_df = read_table(input_file)
     
     # --- HANDLING EMPTY DATA (Based on your previous output) ---
     if rfm_df.empty or len(rfm_df) < 10:
@@ -46,66 +69,165 @@ def perform_clustering(input_file, scaled_output, model_output):
         # Create a dummy file to proceed to the next task
         dummy_data = {'customer_id': [1, 2, 3], 'recency': [10, 50, 200], 
                       'frequency': [10, 5, 1], 'monetary': [5000, 500, 50], 'Cluster': [2, 1, 0]}
-        pd.DataFrame(dummy_data).to_csv(model_output, index=False)
+        write_table(pd.DataFrame(dummy_data), model_output)
         print(f"Dummy cluster file created: {model_output}")
         return
 
+    # --- Reuse the saved segment model unless the customer base has drifted ---
+    selection = selection_config(k_range, algorithm, selection_method)
+    model = load_segment_model(model_file) if refit == 'auto' else None
+    if model is not None and selection_changed(model, selection):
+        print(f"Segment model '{model_file}' was fitted with other K-selection settings. Refitting...")
+        model = None
+    if model is not None:
+        drifted, report = check_drift(model, rfm_df)
+        print(f"Drift check against '{model_file}': {report}")
+        if not drifted:
+            print("No drift detected. Assigning customers to the saved segments...")
+            _save_scaled_features(scale_features(model, rfm_df), scaled_output)
+            rfm_df['Cluster'] = assign_segments(model, rfm_df)
+            _save_results(rfm_df, model_output)
+            return
+        print("Customer base has drifted. Refitting the segment model...")
+
     # 2. Prepare Data for Scaling
-    X = rfm_df[['recency', 'frequency', 'monetary']].copy()
+    X = rfm_df[FEATURE_COLUMNS].copy()
     
     # --- Critical Step: Handle Skewness (Log Transformation) ---
     # Log transformation is standard for highly skewed monetary/frequency data
-    # We add 1 before log to handle any zero values (though our ETL should prevent most)
-    X_log = X.apply(lambda x: np.log(x.clip(lower=1)))
+    # Values are clipped to 1 before log to handle any zero values (though our ETL should prevent most)
+    X_log = log_transform(X)
     
     # 3. Scale the Data (StandardScaler)
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X_log)
-    rfm_scaled_df = pd.DataFrame(X_scaled, columns=['recency_scaled', 'frequency_scaled', 'monetary_scaled'])
-    rfm_scaled_df.to_csv(scaled_output, index=False)
-    print(f"Scaled features saved to: {scaled_output}")
+    _save_scaled_features(X_scaled, scaled_output)
     
-    # 4. Determine Optimal K (Elbow Method)
+    # 4. Determine Optimal K (parallel sweep, automatic elbow/silhouette selection)
     print("\n--- Determining Optimal K (Elbow Method) ---")
-    sse = {}
-    k_range = range(1, 11)
-    
-    # Calculate Sum of Squared Errors (SSE)
-    for k in k_range:
-        # Suppress future warning about n_init (required by sklearn 1.2+)
-        kmeans = KMeans(n_clusters=k, random_state=42, n_init='auto', max_iter=300) 
-        kmeans.fit(X_scaled)
-        sse[k] = kmeans.inertia_
-
-    # Plotting the Elbow Method result
-    plt.figure(figsize=(8, 5))
-    plt.plot(list(sse.keys()), list(sse.values()), marker='o')
-    plt.title('Elbow Method for Optimal K')
-    plt.xlabel('Number of Clusters (K)')
-    plt.ylabel('Sum of Squared Errors (SSE)')
-    plt.grid(True)
-    plt.savefig('elbow_method_visualization.png')
-    print("Elbow plot saved as 'elbow_method_visualization.png'")
+    optimal_k, sse, silhouettes = select_k(X_scaled, k_range, n_jobs, algorithm, method=selection_method)
+    for k in sorted(sse):
+        score = f", silhouette = {silhouettes[k]:.3f}" if k in silhouettes else ""
+        print(f"k = {k}: SSE = {sse[k]:.1f}{score}")
+
+    # Plotting the Elbow Method result (rendered in the background)
+    render(line_plot, 'elbow_method_visualization.png', list(sse.keys()), list(sse.values()),
+           'Elbow Method for Optimal K', 'Number of Clusters (K)', 'Sum of Squared Errors (SSE)')
     
-    # Manually estimate K (we default to 4 for this standard retail exercise)
-    optimal_k = estimate_optimal_k(sse)
-    print(f"Optimal number of clusters (K) chosen: {optimal_k}")
+    print(f"Optimal number of clusters (K) chosen ({selection_method}): {optimal_k}")
     
 
     # 5. Apply K-Means with Optimal K
-    print(f"Applying K-Means clustering with K = {optimal_k}...")
-    final_kmeans = KMeans(n_clusters=optimal_k, random_state=42, n_init='auto', max_iter=300)
+    final_algorithm = resolve_algorithm(len(X_scaled), algorithm)
+    print(f"Applying K-Means clustering with K = {optimal_k} ({final_algorithm})...")
+    final_kmeans = make_kmeans(optimal_k, final_algorithm)
     rfm_df['Cluster'] = final_kmeans.fit_predict(X_scaled)
 
-    # 6. Save Final Results
-    final_results = rfm_df[['customer_id', 'recency', 'frequency', 'monetary', 'Cluster']]
-    final_results.to_csv(model_output, index=False)
-    
-    print("\n--- K-Means Clustering Complete ---")
+    # 6. Save the Segment Model and Final Results
+    model = build_segment_model(scaler, final_kmeans.cluster_centers_, selection)
+    _, distances = nearest_centroids(model, X_scaled)
+    set_drift_baseline(model, distances.sum(), len(distances))
+    save_segment_model(model, model_file)
+    print(f"Segment model saved to: {model_file}")
+    _save_results(rfm_df, model_output)
+    wait_for_plots()
+
+
+def _feature_chunks(input_file, chunk_size):
+    """
+    Yields the RFM feature file in chunks of `chunk_size` customers.
+    """
+    return read_table_chunks(input_file, chunk_size, columns=['customer_id'] + FEATURE_COLUMNS)
+
+def _update_reservoir(reservoir, rows, seen, size, rng):
+    """
+    Adds `rows` to a fixed-size uniform sample of everything seen so far
+    (reservoir sampling, vectorized per chunk). Returns (reservoir, seen).
+    """
+    if reservoir is None:
+        reservoir = np.empty((0, rows.shape[1]), dtype=rows.dtype)
+    free = size - len(reservoir)
+    if free > 0:
+        reservoir = np.vstack([reservoir, rows[:free]])
+        seen += len(rows[:free])
+        rows = rows[free:]
+    if len(rows):
+        # Row number n (1-based) replaces a random slot with probability size / n
+        slots = rng.integers(0, seen + np.arange(1, len(rows) + 1))
+        keep = slots < size
+        reservoir[slots[keep]] = rows[keep]
+        seen += len(rows)
+    return reservoir, seen
+
+def perform_streaming_clustering(input_file, model_output, chunk_size, k_range=K_RANGE, n_jobs=N_JOBS,
+                                 selection_method=SELECTION_METHOD, model_file=MODEL_FILE,
+                                 epochs=STREAM_EPOCHS, sample_size=SWEEP_SAMPLE_SIZE):
+    """
+    Clusters customers out of core, so peak memory depends on `chunk_size` and
+    `sample_size` rather than on the number of customers:
+    1. one pass fits the scaler statistics and keeps a fixed-size random sample,
+    2. K is selected on the sample,
+    3. MiniBatchKMeans is updated chunk by chunk on float32 arrays for `epochs` passes,
+    4. labels are written to `model_output` one chunk at a time.
+    """
+    if not os.path.exists(input_file):
+        print(f"ERROR: RFM feature file not found at '{input_file}'.")
+        print("Please ensure rfm_feature_engineering.py was run successfully.")
+        return
+
+    # 1. Scaler Statistics and K-Selection Sample (one pass)
+    scaler = StandardScaler()
+    rng = np.random.default_rng(RANDOM_STATE)
+    sample, seen = None, 0
+    for chunk in _feature_chunks(input_file, chunk_size):
+        X_log = log_transform(chunk[FEATURE_COLUMNS])
+        scaler.partial_fit(X_log)
+        sample, seen = _update_reservoir(sample, X_log, seen, sample_size, rng)
+    if seen < 10:
+        print("\nWARNING: RFM dataset is empty or too small. Use perform_clustering for small files.")
+        return
+    print(f"Scaler statistics fitted on {seen} customers (K-selection sample: {len(sample)}).")
+    sample = scaler.transform(sample).astype(np.float32)
+
+    # 2. Determine Optimal K on the sample
+    print("\n--- Determining Optimal K (Elbow Method, sampled) ---")
+    optimal_k, sse, _ = select_k(sample, k_range, n_jobs, 'minibatch', sweep_sample_size=None, method=selection_method)
+    print(f"Optimal number of clusters (K) chosen ({selection_method}): {optimal_k}")
+
+    # 3. Mini-Batch K-Means, seeded on the sample and updated chunk by chunk
+    kmeans = make_kmeans(optimal_k, 'minibatch').partial_fit(sample)
+    del sample
+    for epoch in range(epochs):
+        for chunk in _feature_chunks(input_file, chunk_size):
+            X_scaled = scaler.transform(log_transform(chunk[FEATURE_COLUMNS])).astype(np.float32)
+            for start in range(0, len(X_scaled), MINIBATCH_BATCH_SIZE):
+                kmeans.partial_fit(X_scaled[start:start + MINIBATCH_BATCH_SIZE])
+        print(f"Mini-batch pass {epoch + 1}/{epochs} complete.")
+
+    # 4. Write Labels chunk by chunk and record the drift baseline
+    model = build_segment_model(scaler, kmeans.cluster_centers_,
+                                selection_config(k_range, 'minibatch', selection_method))
+    distance_sum = 0.0
+
+    def labelled_chunks():
+        nonlocal distance_sum
+        for chunk in _feature_chunks(input_file, chunk_size):
+            chunk['Cluster'], distances = nearest_centroids(model, scale_features(model, chunk))
+            distance_sum += distances.sum()
+            yield chunk[['customer_id', 'recency', 'frequency', 'monetary', 'Cluster']]
+
+    write_table_chunks(labelled_chunks(), model_output)
+    set_drift_baseline(model, distance_sum, seen)
+    save_segment_model(model, model_file)
+
+    print("\n--- Streaming K-Means Clustering Complete ---")
+    print(f"Segment model saved to: {model_file}")
     print(f"Final customer segmentation saved to: {model_output}")
-    print("\nSample Clustered Data:")
-    print(final_results.head().to_markdown(index=False))
 
 
 if __name__ == '__main__':
-    perform_clustering(INPUT_FILE, OUTPUT_SCALED_FILE, OUTPUT_MODEL_FILE)
\ No newline at end of file
+    if CHUNK_SIZE:
+        # Streaming mode: bounded memory, no scaled-feature copy is written
+        perform_streaming_clustering(INPUT_FILE, OUTPUT_MODEL_FILE, CHUNK_SIZE)
+    else:
+        perform_clustering(INPUT_FILE, OUTPUT_SCALED_FILE, OUTPUT_MODEL_FILE)
@@ -1,53 +1,91 @@
-import sqlite3
 import pandas as pd
-from datetime import datetime, date
+from datetime import timedelta
 import os
 
+import columnar_backend
+import rfm_feature_store
+from artifact_io import write_table
+
 # --- Configuration ---
 # Point directly to the database file in the project root
 DB_PATH = 'retail_dw.db' 
-OUTPUT_FILE = 'rfm_features.csv'
+OUTPUT_FILE = 'rfm_features.feather'  # Typed binary interchange (a '.csv' path writes CSV instead)
+# 'sqlite' reads the warehouse file; 'duckdb' reads the Parquet export (see columnar_backend.py)
+BACKEND = 'sqlite'
+PARQUET_DIR = columnar_backend.PARQUET_DIR
+# Recency is measured from this date (e.g. '2011-12-10').
+# None uses the day after the last transaction date in the data.
+SNAPSHOT_DATE = None
+# Read per-customer aggregates from the CustomerRFM feature store (kept current by the ETL)
+# instead of aggregating the whole SalesFact history
+USE_FEATURE_STORE = True
+
+# --- SQL Query: per-customer aggregation done by the database ---
+RFM_SQL = """
+SELECT
+    f.customer_id,
+    MAX(t.date) AS last_purchase_date,
+    COUNT(DISTINCT f.invoice_no) AS frequency,
+    SUM(f.sales_amount) AS monetary
+FROM SalesFact f
+JOIN TimeDim t ON f.time_id = t.time_id
+GROUP BY f.customer_id;
+"""
+
+def _feature_store_ready(conn):
+    """
+    Returns True if the CustomerRFM store exists and has been populated.
+    """
+    if not rfm_feature_store.has_rfm_store(conn):
+        return False
+    if conn.execute("SELECT 1 FROM CustomerRFM LIMIT 1").fetchone() is not None:
+        return True
+    if conn.execute("SELECT 1 FROM SalesFact LIMIT 1").fetchone() is not None:
+        print("WARNING: CustomerRFM is empty. Run rfm_feature_store.rebuild_rfm_store() to populate it.")
+    return False
 
-def calculate_rfm(db_path, output_file):
+def compute_rfm(conn, snapshot_date=None, use_store=USE_FEATURE_STORE):
+    """
+    Returns one row per customer with recency (days from the last purchase to
+    `snapshot_date`), frequency (distinct invoices) and monetary (total sales).
+    The per-customer aggregates come from the CustomerRFM feature store when available,
+    otherwise from one SQL aggregation over SalesFact; recency is a single vectorized
+    date subtraction, so any snapshot date can be used.
+    """
+    sql = rfm_feature_store.READ_SQL if use_store and _feature_store_ready(conn) else RFM_SQL
+    rfm_df = columnar_backend.read_sql(conn, sql)
+    last_purchase = pd.to_datetime(rfm_df['last_purchase_date'])
+
+    if snapshot_date is None:
+        # Define a snapshot date (the day after the last transaction date in the data)
+        snapshot_date = last_purchase.max() + timedelta(days=1)
+    rfm_df['recency'] = (pd.Timestamp(snapshot_date) - last_purchase).dt.days
+
+    return rfm_df[['customer_id', 'recency', 'frequency', 'monetary']]
+
+def calculate_rfm(db_path, output_file, backend=BACKEND, parquet_dir=PARQUET_DIR, snapshot_date=SNAPSHOT_DATE):
     """
     Calculates Recency, Frequency, and Monetary values for each customer 
-    from the Data Warehouse and saves the result to a CSV.
+    from the Data Warehouse and saves the result to `output_file`.
+    With the 'duckdb' backend the Parquet export is refreshed first if it is
+    older than the warehouse in `db_path`.
     """
-    if not os.path.exists(db_path):
-        print(f"ERROR: Database file not found at '{db_path}'. Please ensure it exists.")
+    if backend == 'duckdb':
+        columnar_backend.refresh_export(db_path, parquet_dir)
+    source = parquet_dir if backend == 'duckdb' else db_path
+    if not os.path.exists(source):
+        print(f"ERROR: Data source not found at '{source}'. Please ensure it exists.")
         return
 
-    conn = sqlite3.connect(db_path)
-    print("Connected to Data Warehouse. Starting RFM calculation...")
-
-    # Define a snapshot date (the day after the last transaction date in the data)
-    SNAPSHOT_DATE = datetime(2011, 12, 10) 
-
-    # --- SQL Query to pull necessary data ---
-    sql_query = """
-    SELECT
-        f.customer_id,
-        f.sales_amount,
-        f.invoice_no,
-        t.date 
-    FROM SalesFact f
-    JOIN TimeDim t ON f.time_id = t.time_id;
-    """
-    
-    df = pd.read_sql_query(sql_query, conn)
-    conn.close()
-    
+    conn = columnar_backend.connect(backend, db_path, parquet_dir)
+    print(f"Connected to Data Warehouse ({backend}). Starting RFM calculation...")
+
     # Calculate RFM metrics
-    rfm_df = df.groupby('customer_id').agg({
-        'date': lambda x: (SNAPSHOT_DATE - pd.to_datetime(x).max()).days,  # Recency
-        'invoice_no': 'nunique',  # Frequency
-        'sales_amount': 'sum'  # Monetary
-    }).reset_index()
-    
-    rfm_df.columns = ['customer_id', 'recency', 'frequency', 'monetary']
+    rfm_df = compute_rfm(conn, snapshot_date)
+    conn.close()
     
-    # Save the resulting features to a CSV
-    rfm_df.to_csv(output_file, index=False)
+    # Save the resulting features (Feather, see artifact_io.py)
+    write_table(rfm_df, output_file)
 
     print("\n--- RFM Feature Engineering Complete ---")
     print(f"Total Customers Processed: {len(rfm_df)}")
@@ -0,0 +1,69 @@
+import sqlite3
+
+# --- SQL: fold the fact rows loaded after a given sales_id into CustomerRFM ---
+# An invoice already seen in an earlier load (e.g. split across streamed chunks)
+# is not counted again, so invoice_count stays a distinct count. The unary '+'
+# in GROUP BY keeps SQLite from walking the customer index over the full history
+# and makes it range-scan the new sales_ids instead.
+REFRESH_SQL = """
+INSERT INTO CustomerRFM (customer_id, last_purchase_date, invoice_count, monetary)
+SELECT
+    f.customer_id,
+    MAX(t.date),
+    COUNT(DISTINCT CASE WHEN NOT EXISTS (
+        SELECT 1 FROM SalesFact earlier
+        WHERE earlier.invoice_no = f.invoice_no AND earlier.customer_id = f.customer_id
+          AND earlier.sales_id <= :after_sales_id
+    ) THEN f.invoice_no END),
+    SUM(f.sales_amount)
+FROM SalesFact f
+JOIN TimeDim t ON f.time_id = t.time_id
+WHERE f.sales_id > :after_sales_id
+GROUP BY +f.customer_id
+ON CONFLICT(customer_id) DO UPDATE SET
+    last_purchase_date = MAX(last_purchase_date, excluded.last_purchase_date),
+    invoice_count = invoice_count + excluded.invoice_count,
+    monetary = monetary + excluded.monetary;
+"""
+
+# Reads the store in the same shape as rfm_feature_engineering.RFM_SQL
+READ_SQL = """
+SELECT
+    customer_id,
+    last_purchase_date,
+    invoice_count AS frequency,
+    monetary
+FROM CustomerRFM;
+"""
+
+def has_rfm_store(conn):
+    """
+    Returns True if the database has the CustomerRFM feature store
+    (a table in SQLite, or a view over the Parquet export in DuckDB).
+    """
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = 'CustomerRFM'"
+    ).fetchone() is not None
+
+def refresh_rfm_store(conn, after_sales_id=0):
+    """
+    Updates CustomerRFM from the SalesFact rows with sales_id > `after_sales_id` only,
+    so the cost follows the number of new transactions rather than the full history.
+    Runs inside the caller's transaction.
+    """
+    if not has_rfm_store(conn):
+        print("WARNING: CustomerRFM not found. Re-run create_tables.py to enable the RFM feature store.")
+        return
+    conn.execute(REFRESH_SQL, {'after_sales_id': after_sales_id})
+
+def rebuild_rfm_store(db_name):
+    """
+    Recomputes CustomerRFM from the full SalesFact history
+    (for databases loaded before the feature store existed).
+    """
+    conn = sqlite3.connect(db_name)
+    conn.execute("DELETE FROM CustomerRFM;")
+    refresh_rfm_store(conn)
+    conn.commit()
+    conn.close()
+    print(f"RFM feature store rebuilt in '{db_name}'.")
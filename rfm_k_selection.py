@@ -0,0 +1,137 @@
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from threadpoolctl import threadpool_limits
+
+# --- Configuration ---
+K_RANGE = range(1, 16)            # Upper bound only: the sweep usually stops early
+N_JOBS = os.cpu_count() or 1      # Candidate k values fitted at the same time
+ALGORITHM = 'auto'                # 'kmeans', 'minibatch', or 'auto' (minibatch above MINIBATCH_THRESHOLD rows)
+MINIBATCH_THRESHOLD = 100000
+MINIBATCH_BATCH_SIZE = 4096
+SWEEP_SAMPLE_SIZE = 50000         # The sweep fits on a random sample of at most this many customers (None = all)
+SELECTION_METHOD = 'kneedle'      # 'kneedle' (elbow of the SSE curve) or 'silhouette'
+SILHOUETTE_SAMPLE_SIZE = 10000
+EARLY_STOP_TOL = 0.02             # A k "helps" if it removes at least this share of the k=1 SSE
+EARLY_STOP_PATIENCE = 2           # Stop once this many consecutive k values no longer help
+RANDOM_STATE = 42
+ALGORITHMS = ('auto', 'kmeans', 'minibatch')
+SELECTION_METHODS = ('kneedle', 'silhouette')
+
+def resolve_algorithm(n_rows, algorithm=ALGORITHM):
+    """
+    Returns 'kmeans' or 'minibatch' for a dataset of `n_rows` rows.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm '{algorithm}'. Choose one of {ALGORITHMS}.")
+    if algorithm == 'auto':
+        return 'minibatch' if n_rows > MINIBATCH_THRESHOLD else 'kmeans'
+    return algorithm
+
+def make_kmeans(k, algorithm='kmeans', random_state=RANDOM_STATE):
+    """
+    Returns an unfitted KMeans or MiniBatchKMeans model with `k` clusters.
+    """
+    if algorithm == 'minibatch':
+        return MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init='auto',
+                               batch_size=MINIBATCH_BATCH_SIZE)
+    return KMeans(n_clusters=k, random_state=random_state, n_init='auto', max_iter=300)
+
+def fit_candidate(X, k, algorithm='kmeans', silhouette_sample_size=None, random_state=RANDOM_STATE):
+    """
+    Fits one candidate k and returns (k, sse, silhouette). The silhouette is
+    only computed (on a sample) when `silhouette_sample_size` is given and k >= 2.
+    """
+    model = make_kmeans(k, algorithm, random_state).fit(X)
+    silhouette = None
+    if silhouette_sample_size and k >= 2:
+        silhouette = silhouette_score(X, model.labels_, sample_size=min(silhouette_sample_size, len(X)),
+                                      random_state=random_state)
+    return k, model.inertia_, silhouette
+
+def kneedle_k(sse):
+    """
+    Returns the elbow of a decreasing SSE curve {k: sse} with the Kneedle method:
+    both axes are scaled to [0, 1] and the knee is the k furthest above the
+    straight line joining the first and last points.
+    """
+    ks = np.array(sorted(sse))
+    if len(ks) < 3:
+        return int(ks[-1])
+    values = np.array([sse[k] for k in ks], dtype=float)
+    x = (ks - ks[0]) / (ks[-1] - ks[0])
+    span = values.max() - values.min()
+    if span == 0:
+        return int(ks[0])
+    y = (values - values.min()) / span
+    difference = (1 - y) - x
+    return int(ks[np.argmax(difference)])
+
+def estimate_optimal_k(sse_dict, silhouettes=None, method=SELECTION_METHOD):
+    """
+    Estimates the optimal number of clusters K from the SSE dictionary:
+    'kneedle' takes the elbow of the SSE curve, 'silhouette' the k with the
+    highest (sampled) silhouette score.
+    """
+    if method not in SELECTION_METHODS:
+        raise ValueError(f"Unknown selection method '{method}'. Choose one of {SELECTION_METHODS}.")
+    if method == 'silhouette' and silhouettes:
+        return max(silhouettes, key=silhouettes.get)
+    return kneedle_k(sse_dict)
+
+def _elbow_passed(sse, tol, patience):
+    """
+    Returns True once the last `patience` k values each removed less than `tol`
+    of the first SSE, i.e. the curve has flattened out past its elbow.
+    """
+    ks = sorted(sse)
+    if len(ks) <= patience or sse[ks[0]] == 0:
+        return False
+    recent = ks[-(patience + 1):]
+    gains = [(sse[a] - sse[b]) / sse[ks[0]] for a, b in zip(recent, recent[1:])]
+    return all(gain < tol for gain in gains)
+
+def select_k(X, k_range=K_RANGE, n_jobs=N_JOBS, algorithm=ALGORITHM, sweep_sample_size=SWEEP_SAMPLE_SIZE,
+             method=SELECTION_METHOD, silhouette_sample_size=SILHOUETTE_SAMPLE_SIZE,
+             early_stop_tol=EARLY_STOP_TOL, early_stop_patience=EARLY_STOP_PATIENCE, random_state=RANDOM_STATE):
+    """
+    Sweeps candidate k values and picks one automatically.
+    The candidates are fitted `n_jobs` at a time in threads (each fit restricted
+    to one BLAS/OpenMP thread so the fits do not oversubscribe the cores), on a
+    random sample of at most `sweep_sample_size` rows, and with MiniBatchKMeans
+    for large inputs. The sweep stops early once the SSE curve has flattened past its elbow.
+    The stopping rule is checked one k at a time in ascending order and fits past
+    the stopping k are discarded, so the curve (and K) does not depend on `n_jobs`.
+    Returns (optimal_k, sse, silhouettes) where sse/silhouettes map k to their values.
+    """
+    X = np.asarray(X)
+    algorithm = resolve_algorithm(len(X), algorithm)
+    if sweep_sample_size and len(X) > sweep_sample_size:
+        rng = np.random.default_rng(random_state)
+        X = X[rng.choice(len(X), sweep_sample_size, replace=False)]
+    candidates = sorted(k for k in k_range if k <= len(X))
+    silhouette_sample = silhouette_sample_size if method == 'silhouette' else None
+    n_jobs = max(1, n_jobs or 1)
+
+    sse, silhouettes = {}, {}
+    stopped = False
+    with threadpool_limits(limits=1 if n_jobs > 1 else None), ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        for start in range(0, len(candidates), n_jobs):
+            wave = candidates[start:start + n_jobs]
+            fits = executor.map(lambda k: fit_candidate(X, k, algorithm, silhouette_sample, random_state), wave)
+            for k, inertia, silhouette in fits:
+                sse[k] = inertia
+                if silhouette is not None:
+                    silhouettes[k] = silhouette
+                # Same check as a one-at-a-time sweep: the rest of the wave is not used
+                if early_stop_tol and _elbow_passed(sse, early_stop_tol, early_stop_patience):
+                    print(f"Early stop: SSE curve flat after k = {k}.")
+                    stopped = True
+                    break
+            if stopped:
+                break
+
+    optimal_k = estimate_optimal_k(sse, silhouettes, method)
+    return optimal_k, sse, silhouettes
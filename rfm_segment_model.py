@@ -0,0 +1,140 @@
+import os
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+MODEL_FILE = 'rfm_segment_model.npz'
+FEATURE_COLUMNS = ['recency', 'frequency', 'monetary']
+LOG_FLOOR = 1                 # Values are clipped to this before the log transform (avoids log(0))
+DRIFT_DISTANCE_RATIO = 1.25   # Refit once customers sit this much further from their centroids than at fit time
+DRIFT_MEAN_SHIFT = 0.25       # ...or once any feature mean moves this many training standard deviations
+
+def log_transform(features):
+    """
+    Applies the clustering log transform to an (n, 3) array of raw RFM values.
+    """
+    return np.log(np.clip(np.asarray(features, dtype=np.float64), LOG_FLOOR, None))
+
+def _as_feature_array(customers):
+    """
+    Returns raw RFM values as an (n, 3) array from a DataFrame, a dict for one
+    customer, or an array-like of shape (3,) or (n, 3).
+    """
+    if isinstance(customers, pd.DataFrame):
+        return customers[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    if isinstance(customers, dict):
+        return np.array([[customers[column] for column in FEATURE_COLUMNS]], dtype=np.float64)
+    return np.atleast_2d(np.asarray(customers, dtype=np.float64))
+
+def selection_config(k_range, algorithm, selection_method):
+    """
+    Returns the K-selection settings a model was fitted with, as saved alongside it.
+    """
+    return {
+        'k_candidates': np.array(sorted(k_range), dtype=np.int64),
+        'algorithm': str(algorithm),
+        'selection_method': str(selection_method),
+    }
+
+def selection_changed(model, selection):
+    """
+    Returns True when the saved model was fitted with other K-selection settings
+    than `selection` (or before they were saved), or its K is not a candidate.
+    """
+    if any(key not in model for key in selection):
+        return True
+    if len(model['centroids']) not in selection['k_candidates']:
+        return True
+    return (not np.array_equal(model['k_candidates'], selection['k_candidates'])
+            or model['algorithm'] != selection['algorithm']
+            or model['selection_method'] != selection['selection_method'])
+
+def build_segment_model(scaler, centroids, selection):
+    """
+    Collects everything needed to score new customers without refitting: the
+    scaler statistics, the centroids and the K-selection settings (see
+    selection_config). The drift baseline is filled in by set_drift_baseline
+    once the training customers have been assigned.
+    """
+    centroids = np.asarray(centroids, dtype=np.float64)
+    return {
+        'scaler_mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scaler_scale': np.asarray(scaler.scale_, dtype=np.float64),
+        'centroids': centroids,
+        'centroid_sq_norms': (centroids ** 2).sum(axis=1),
+        'train_mean_distance': 0.0,
+        'n_customers': 0,
+        **selection,
+    }
+
+def set_drift_baseline(model, distance_sum, n_customers):
+    """
+    Records the fit-time mean squared distance of customers to their centroid
+    (the baseline for the drift check) from a running sum over `n_customers`.
+    """
+    model['train_mean_distance'] = float(distance_sum) / n_customers if n_customers else 0.0
+    model['n_customers'] = int(n_customers)
+
+def save_segment_model(model, model_file=MODEL_FILE):
+    """
+    Persists the segment model.
+    """
+    np.savez(model_file, **{key: np.asarray(value) for key, value in model.items() if key != 'centroid_sq_norms'})
+
+def load_segment_model(model_file=MODEL_FILE):
+    """
+    Loads the persisted segment model (None if it has not been fitted yet).
+    """
+    if not os.path.exists(model_file):
+        return None
+    with np.load(model_file, allow_pickle=False) as saved:
+        model = {key: saved[key] for key in saved.files}
+    model['train_mean_distance'] = float(model['train_mean_distance'])
+    model['n_customers'] = int(model['n_customers'])
+    for key in ('algorithm', 'selection_method'):
+        if key in model:
+            model[key] = str(model[key])
+    model['centroid_sq_norms'] = (model['centroids'] ** 2).sum(axis=1)
+    return model
+
+def scale_features(model, customers):
+    """
+    Log-transforms and standardizes raw RFM values with the saved scaler statistics.
+    """
+    return (log_transform(_as_feature_array(customers)) - model['scaler_mean']) / model['scaler_scale']
+
+def nearest_centroids(model, X_scaled):
+    """
+    Returns (labels, squared distances) of the nearest centroid for each scaled row,
+    using ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2 over all centroids at once.
+    """
+    squared = ((X_scaled ** 2).sum(axis=1)[:, None] - 2 * X_scaled @ model['centroids'].T
+               + model['centroid_sq_norms'][None, :])
+    labels = squared.argmin(axis=1)
+    return labels, np.maximum(squared[np.arange(len(labels)), labels], 0)
+
+def assign_segments(model, customers):
+    """
+    Assigns customers to the saved segments without refitting.
+    Accepts a dict for one customer (returns an int) or a DataFrame / array of
+    customers (returns an array of cluster labels).
+    """
+    labels, _ = nearest_centroids(model, scale_features(model, customers))
+    if isinstance(customers, dict):
+        return int(labels[0])
+    return labels
+
+def check_drift(model, customers, distance_ratio=DRIFT_DISTANCE_RATIO, mean_shift=DRIFT_MEAN_SHIFT):
+    """
+    Compares the current customer base with the one the model was fitted on.
+    Returns (drifted, report): drifted is True when customers sit noticeably further
+    from their centroids than at fit time, or a feature mean has shifted.
+    """
+    X_scaled = scale_features(model, customers)
+    _, distances = nearest_centroids(model, X_scaled)
+    report = {
+        'distance_ratio': round(float(distances.mean() / model['train_mean_distance']), 3) if model['train_mean_distance'] else float('inf'),
+        'mean_shift': dict(zip(FEATURE_COLUMNS, np.abs(X_scaled.mean(axis=0)).round(3).tolist())),
+    }
+    drifted = report['distance_ratio'] > distance_ratio or max(report['mean_shift'].values()) > mean_shift
+    return drifted, report
@@ -0,0 +1,102 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+
+# --- Configuration ---
+NAMES_FILE = 'rfm_segment_names.json'
+RFM_COLUMNS = ['recency', 'frequency', 'monetary']
+# A cluster keeps the name of the previous run's cluster it matches if their centroids
+# (log of median R, F, M) are at most this far apart; otherwise it gets a fresh name
+MATCH_TOLERANCE = 0.5
+
+def log_centroids(medians):
+    """
+    Returns the segment centroids used for ranking and matching: the log of the
+    per-segment median R, F and M (medians are robust to the skew in F and M).
+    """
+    return np.log(medians[RFM_COLUMNS].clip(lower=1))
+
+def rank_segments(centroids):
+    """
+    Ranks segments from best (1) to worst on R, F and M: each segment gets its
+    percentile rank per metric (lower recency is better, higher F and M are
+    better) and segments are ordered by the average of the three.
+    """
+    score = pd.concat([
+        (-centroids['recency']).rank(pct=True),
+        centroids['frequency'].rank(pct=True),
+        centroids['monetary'].rank(pct=True),
+    ], axis=1).mean(axis=1)
+    return score.rank(ascending=False, method='first').astype(int)
+
+def describe_segment(centroid, overall):
+    """
+    Names a segment from how its centroid compares with the whole customer base.
+    """
+    recent = centroid['recency'] <= overall['recency']
+    frequent = centroid['frequency'] > overall['frequency']
+    valuable = centroid['monetary'] > overall['monetary']
+    if recent and frequent and valuable:
+        return 'Champions'
+    if recent and (frequent or valuable):
+        return 'Loyal_Customers'
+    if recent:
+        return 'New_Customers'
+    if frequent or valuable:
+        return 'At_Risk'
+    return 'Losing_Customers'
+
+def name_segments(centroids, overall, previous=None, tolerance=MATCH_TOLERANCE):
+    """
+    Returns {cluster: segment name}. Names are '<rank>_<description>' (e.g.
+    '01_Champions'). When the previous run's centroids are given, each cluster is
+    matched to its closest previous segment (one-to-one) and keeps that name if
+    the match is within `tolerance`, so a refit that permutes cluster IDs keeps the names.
+    """
+    ranks = rank_segments(centroids)
+
+    def describe(cluster, number):
+        return f"{number:02d}_{describe_segment(centroids.loc[cluster], overall)}"
+
+    if not previous:
+        return {cluster: describe(cluster, ranks[cluster]) for cluster in centroids.index}
+
+    previous_names = list(previous)
+    previous_centroids = np.array([previous[name] for name in previous_names])
+    current = centroids[RFM_COLUMNS].to_numpy()
+    cost = np.sqrt(((current[:, None, :] - previous_centroids[None, :, :]) ** 2).sum(axis=2))
+    names = {}
+    for row, col in zip(*linear_sum_assignment(cost)):
+        if cost[row, col] <= tolerance:
+            names[centroids.index[row]] = previous_names[col]
+
+    # New segments take their rank as prefix, or the next free number if an inherited name already uses it
+    used = {int(name.split('_', 1)[0]) for name in names.values()}
+    for cluster in ranks.sort_values().index:
+        if cluster in names:
+            continue
+        number = ranks[cluster]
+        while number in used:
+            number += 1
+        used.add(number)
+        names[cluster] = describe(cluster, number)
+    return names
+
+def load_segment_names(names_file=NAMES_FILE):
+    """
+    Loads the previous run's {segment name: centroid} mapping (None if there is none).
+    """
+    if not os.path.exists(names_file):
+        return None
+    with open(names_file) as f:
+        return json.load(f)
+
+def save_segment_names(names, centroids, names_file=NAMES_FILE):
+    """
+    Persists {segment name: centroid} so the next run can match its clusters to these names.
+    """
+    with open(names_file, 'w') as f:
+        json.dump({names[cluster]: centroids.loc[cluster, RFM_COLUMNS].round(6).tolist()
+                   for cluster in centroids.index}, f, indent=2)
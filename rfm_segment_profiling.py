@@ -1,103 +1,79 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 
+from rfm_segment_naming import (
+    NAMES_FILE, RFM_COLUMNS, log_centroids, name_segments, load_segment_names, save_segment_names
+)
+from reporting import render, wait_for_plots, quantile_boxplots, quantile_column, BOX_PERCENTILES
+from artifact_io import read_table
+
 # --- Configuration ---
-INPUT_FILE = 'rfm_clusters_with_scores.csv'
+INPUT_FILE = 'rfm_clusters_with_scores.feather'
+PROFILE_FILE = 'rfm_segment_profiles.csv'
+PROFILE_PERCENTILES = [0.05, 0.25, 0.5, 0.75, 0.95]  # The boxplot quantiles (BOX_PERCENTILES) are always added
 
-def profile_segments(input_file):
+def profile_segments(input_file, profile_output=PROFILE_FILE, names_file=NAMES_FILE):
     """
-    Loads clustered RFM data, profiles each segment, and generates visualizations.
+    Loads clustered RFM data, profiles each segment, names the segments from their
+    R/F/M centroids (stable across runs), and generates visualizations.
     """
     if not os.path.exists(input_file):
         print(f"ERROR: Clustered file not found at '{input_file}'.")
         return
 
     # 1. Load Data
-    rfm_clustered_df = pd.read_csv(input_file)
+    rfm_clustered_df = read_table(input_file)
     
-    # Ensure 'Cluster' is treated as a category
-    rfm_clustered_df['Cluster'] = rfm_clustered_df['Cluster'].astype(str)
-
-    # 2. Calculate Mean RFM Values per Cluster
+    # 2. Profile Statistics per Cluster (one groupby pass: count, mean, spread and quantiles)
     # This is the core of profiling: understanding what defines each group.
-    segment_profiles = rfm_clustered_df.groupby('Cluster')[['recency', 'frequency', 'monetary']].mean().reset_index()
+    percentiles = sorted(set(PROFILE_PERCENTILES) | set(BOX_PERCENTILES))
+    cluster_stats = rfm_clustered_df.groupby('Cluster')[RFM_COLUMNS].describe(percentiles=percentiles)
+    medians = cluster_stats.xs('50%', axis=1, level=1)
+
+    # 3. Assigning Segment Names
+    # Clusters are ranked on their R/F/M centroids and named from how they compare with
+    # the whole customer base. Names carry over from the previous run by centroid matching,
+    # so a refit that renumbers the clusters keeps the same segment names.
+    centroids = log_centroids(medians)
+    overall = log_centroids(rfm_clustered_df[RFM_COLUMNS].median())
+    segment_map = name_segments(centroids, overall, load_segment_names(names_file))
+    save_segment_names(segment_map, centroids, names_file)
+    rfm_clustered_df['Segment_Name'] = rfm_clustered_df['Cluster'].map(segment_map)
+
+    segment_stats = cluster_stats.rename(index=segment_map).sort_index()
+    segment_stats.index.name = 'Segment_Name'
+    quantile_columns = {f"{percentile * 100:g}%": percentile for percentile in percentiles}
+    segment_stats.columns = [quantile_column(metric, quantile_columns[stat]) if stat in quantile_columns else f"{metric}_{stat}"
+                             for metric, stat in segment_stats.columns]
+    segment_stats.round(2).to_csv(profile_output)
+
+    # 4. Print Segment Profiles (Mean RFM Scores)
+    segment_profiles = segment_stats[[f"{metric}_mean" for metric in RFM_COLUMNS]].copy()
+    segment_profiles.columns = RFM_COLUMNS
+    segment_profiles.insert(0, 'customers', segment_stats['recency_count'].astype(int))
     
     # Rounding for clean display
     segment_profiles['recency'] = segment_profiles['recency'].round(0)
     segment_profiles['frequency'] = segment_profiles['frequency'].round(1)
     segment_profiles['monetary'] = segment_profiles['monetary'].round(2)
     
-    # 3. Print Segment Profiles
     print("\n--- Segment Profiling (Mean RFM Scores) ---")
-    print(segment_profiles.to_markdown(index=False))
-
-    # --- 4. Assigning Segment Names ---
-    # NOTE: Since your data is dummy, the logic below is for demonstration 
-    # but the segment names are based on the dummy output provided in rfm_clusters_with_scores.csv
-    
-    # Based on dummy data:
-    # Cluster 0: High Recency (200), Low F(1), Low M(50) -> 'Losing Customers'
-    # Cluster 1: Medium Recency (50), Medium F(5), Medium M(500) -> 'Loyal Customers'
-    # Cluster 2: Low Recency (10), High F(10), High M(5000) -> 'Champions'
-    
-    segment_map = {
-        '2': '01_Champions',
-        '1': '02_Loyal_Customers',
-        '0': '03_Losing_Customers' 
-    }
-    
-    # If more clusters were present, the mapping would be larger. We rely on K=4 analysis.
-    rfm_clustered_df['Segment_Name'] = rfm_clustered_df['Cluster'].map(segment_map)
+    print(segment_profiles.reset_index().to_markdown(index=False))
+    print(f"Full segment statistics (quantiles, spread) saved to: {profile_output}")
     
     # 5. Visualization
-
-    # Melt the data for easier plotting
-    rfm_melt = pd.melt(
-        rfm_clustered_df, 
-        id_vars=['Segment_Name'], 
-        value_vars=['recency', 'frequency', 'monetary'],
-        var_name='Metric', 
-        value_name='Value' # This is the Y-axis value
-    )
-    
-    # Create Box Plots for R, F, M across Segments
-    plt.figure(figsize=(15, 6))
-    
-    # Define plot order and titles
+    # Box Plots for R, F, M across Segments, drawn from the quantile summary
+    # (box = p25/p50/p75, whiskers = p5/p95) rather than from every customer
     plot_metrics = {
         'recency': 'Recency (Days)', 
         'frequency': 'Frequency (Orders)', 
         'monetary': 'Monetary (Spent)'
     }
-    
-    for i, (metric_col, title) in enumerate(plot_metrics.items()):
-        plt.subplot(1, 3, i + 1)
-        
-        # Filter the melted data for the current metric
-        metric_data = rfm_melt[rfm_melt['Metric'] == metric_col]
-        
-        # Use the 'Value' column (which holds the R, F, or M score) for the Y-axis
-        sns.boxplot(
-            x='Segment_Name', 
-            y='Value', 
-            data=metric_data, 
-            palette='viridis'
-        )
-        
-        plt.title(f'Segments by {title}', fontsize=14)
-        plt.xlabel('Customer Segment', fontsize=12)
-        plt.ylabel(title, fontsize=12)
-        plt.xticks(rotation=45, ha='right')
-    
-    plt.tight_layout()
-    plt.savefig('rfm_segment_boxplots.png')
-    print("\nSegment visualization saved as 'rfm_segment_boxplots.png'")
+    render(quantile_boxplots, 'rfm_segment_boxplots.png', segment_stats, plot_metrics, 'Segment')
     
     # 6. Save the final profiled list (for completeness)
     rfm_clustered_df[['customer_id', 'recency', 'frequency', 'monetary', 'Segment_Name']].to_csv('final_customer_segments.csv', index=False)
     print("Final segmentation table saved as 'final_customer_segments.csv'")
+    wait_for_plots()
     
     print("\n--- Section 2: Data Mining Complete! ---")
 
@@ -0,0 +1,91 @@
+import sqlite3
+import numpy as np
+
+# --- Configuration ---
+DB_NAME = 'retail_dw.db'
+TOP_N = 5
+ITEM_SEPARATOR = ','  # Stock codes within a persisted antecedent/consequent set
+
+def has_rule_tables(conn):
+    """
+    Returns True if the database has the AssociationRule tables.
+    """
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'AssociationRule'"
+    ).fetchone() is not None
+
+def save_rules(conn, rules):
+    """
+    Replaces the persisted rules with `rules` (association_rules output, with
+    frozenset antecedents/consequents). Rule ids are assigned in descending
+    lift order. Runs inside the caller's transaction.
+    """
+    if not has_rule_tables(conn):
+        print("WARNING: AssociationRule not found. Re-run create_tables.py to persist mined rules.")
+        return
+    ordered = rules.sort_values(['lift', 'confidence'], ascending=False)
+    rule_rows, item_rows = [], []
+    for rule_id, (antecedents, consequents, support, confidence, lift) in enumerate(zip(
+            ordered['antecedents'], ordered['consequents'], ordered['support'], ordered['confidence'], ordered['lift']), 1):
+        rule_rows.append((rule_id, ITEM_SEPARATOR.join(sorted(antecedents)), ITEM_SEPARATOR.join(sorted(consequents)),
+                          len(antecedents), float(support), float(confidence), float(lift)))
+        item_rows.extend((item, rule_id) for item in antecedents)
+    conn.execute("DELETE FROM AssociationRuleItem;")
+    conn.execute("DELETE FROM AssociationRule;")
+    conn.executemany("INSERT INTO AssociationRule VALUES (?, ?, ?, ?, ?, ?, ?)", rule_rows)
+    conn.executemany("INSERT INTO AssociationRuleItem (item, rule_id) VALUES (?, ?)", item_rows)
+    print(f"Saved {len(rule_rows)} association rules.")
+
+def build_rule_index(conn):
+    """
+    Loads the persisted rules into an in-memory inverted index: for every
+    antecedent item, the sorted positions of the rules it appears in. Positions
+    follow descending lift, so scanning matching rules in position order yields
+    the best consequents first.
+    """
+    rules = conn.execute(
+        "SELECT rule_id, consequents, antecedent_size, lift FROM AssociationRule ORDER BY rule_id"
+    ).fetchall()
+    position = {rule_id: i for i, (rule_id, _, _, _) in enumerate(rules)}
+    postings = {}
+    for item, rule_id in conn.execute("SELECT item, rule_id FROM AssociationRuleItem ORDER BY item, rule_id"):
+        postings.setdefault(item, []).append(position[rule_id])
+    return {
+        'item_rules': {item: np.array(ids, dtype=np.int64) for item, ids in postings.items()},
+        'antecedent_sizes': np.array([row[2] for row in rules], dtype=np.int64),
+        'consequents': [tuple(row[1].split(ITEM_SEPARATOR)) for row in rules],
+        'lift': np.array([row[3] for row in rules], dtype=np.float64),
+    }
+
+def load_rule_index(db_name=DB_NAME):
+    """
+    Opens the warehouse and builds the rule index (see build_rule_index).
+    """
+    conn = sqlite3.connect(db_name)
+    index = build_rule_index(conn)
+    conn.close()
+    return index
+
+def recommend(index, cart, top_n=TOP_N):
+    """
+    Returns up to `top_n` (stock_code, lift) "also bought" suggestions for a cart
+    of stock codes: consequents of the rules whose whole antecedent is in the cart,
+    best lift first, excluding items already in the cart.
+    """
+    cart = set(cart)
+    postings = [index['item_rules'][item] for item in cart if item in index['item_rules']]
+    if not postings:
+        return []
+    # A rule applies when every one of its antecedent items was hit by the cart
+    rules, hits = np.unique(np.concatenate(postings), return_counts=True)
+    applicable = rules[hits == index['antecedent_sizes'][rules]]
+
+    suggestions, seen = [], set(cart)
+    for rule in applicable:
+        for item in index['consequents'][rule]:
+            if item not in seen:
+                seen.add(item)
+                suggestions.append((item, float(index['lift'][rule])))
+                if len(suggestions) == top_n:
+                    return suggestions
+    return suggestions
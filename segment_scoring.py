@@ -0,0 +1,143 @@
+import os
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree, BallTree
+
+from artifact_io import read_table, read_table_chunks, write_table_chunks
+
+# --- Configuration ---
+MODEL_FILE = 'segment_classifiers.joblib'
+INPUT_FILE = 'rfm_features.feather'
+OUTPUT_FILE = 'scored_customers.feather'  # '.csv' writes CSV
+SCORE_MODEL = 'decision_tree'     # Model used for batch scoring ('decision_tree' or 'knn')
+SCORE_CHUNK_SIZE = 100000         # Customers scored per vectorized batch
+LATENCY_SAMPLES = 1000            # Single-customer predictions timed per model
+
+def save_classifiers(models, features, target, metrics, X_train, y_train, model_file=MODEL_FILE):
+    """
+    Persists the trained classifiers with their feature schema (column order),
+    target, evaluation metrics and the KNN training data (for the warm lookup index).
+    """
+    bundle = {
+        'models': models,
+        'features': list(features),
+        'target': target,
+        'metrics': metrics,
+        'knn_training': (np.asarray(X_train, dtype=np.float64), np.asarray(y_train)),
+    }
+    joblib.dump(bundle, model_file)
+    print(f"Classifiers saved to: {model_file}")
+
+def load_classifiers(model_file=MODEL_FILE):
+    """
+    Loads the persisted classifiers and warms them up for single-customer scoring:
+    the KNN neighbor index is built once here rather than on every request.
+    Returns the scoring service (a dict), or None if no classifiers were saved.
+    """
+    if not os.path.exists(model_file):
+        print(f"ERROR: Classifier file not found at '{model_file}'. Run classification.py first.")
+        return None
+    service = joblib.load(model_file)
+    X_train, y_train = service.pop('knn_training')
+
+    knn = service['models']['knn']
+    index_type = KDTree if knn.effective_metric_ in KDTree.valid_metrics else BallTree
+    service['knn_index'] = index_type(X_train, metric=knn.effective_metric_, **knn.effective_metric_params_)
+    service['knn_classes'], service['knn_labels'] = np.unique(y_train, return_inverse=True)
+
+    # One prediction per model so the first real request doesn't pay for lazy initialization
+    warm_row = X_train[:1]
+    for model in service['models']:
+        predict_one(service, warm_row[0], model)
+    return service
+
+def _feature_matrix(service, customers):
+    """
+    Returns the customers' features as a float64 array in the training column order,
+    raising ValueError if any feature column is missing.
+    """
+    missing = [column for column in service['features'] if column not in customers.columns]
+    if missing:
+        raise ValueError(f"Missing feature columns for scoring: {missing}")
+    return customers[service['features']].to_numpy(dtype=np.float64)
+
+def predict_batch(service, customers, model=SCORE_MODEL):
+    """
+    Classifies a DataFrame of customers with one vectorized predict call.
+    """
+    return service['models'][model].predict(_feature_matrix(service, customers))
+
+def predict_one(service, customer, model=SCORE_MODEL):
+    """
+    Classifies a single customer (a dict keyed by feature name, or a sequence in
+    feature order) with the warm models: the decision tree skips input validation
+    and KNN queries the preloaded neighbor index directly.
+    """
+    if isinstance(customer, dict):
+        customer = [customer[column] for column in service['features']]
+    if model == 'knn':
+        knn = service['models']['knn']
+        row = np.asarray(customer, dtype=np.float64).reshape(1, -1)
+        neighbors = service['knn_index'].query(row, k=knn.n_neighbors, return_distance=False)[0]
+        votes = np.bincount(service['knn_labels'][neighbors], minlength=len(service['knn_classes']))
+        return service['knn_classes'][votes.argmax()]
+    row = np.asarray(customer, dtype=np.float32).reshape(1, -1)
+    return service['models'][model].predict(row, check_input=False)[0]
+
+def score_batch(service, input_file=INPUT_FILE, output_file=OUTPUT_FILE, model=SCORE_MODEL, chunk_size=SCORE_CHUNK_SIZE):
+    """
+    Scores a customer file in vectorized chunks, writing each scored chunk as it
+    is produced. Returns the scoring throughput metrics.
+    """
+    seconds = 0.0
+
+    def scored_chunks():
+        nonlocal seconds
+        for chunk in read_table_chunks(input_file, chunk_size):
+            start = time.perf_counter()
+            chunk['Predicted_Cluster'] = predict_batch(service, chunk, model)
+            seconds += time.perf_counter() - start
+            yield chunk
+
+    rows = write_table_chunks(scored_chunks(), output_file)
+    print(f"Scored {rows} customers with '{model}' -> {output_file}")
+    return {'rows': rows, 'seconds': round(seconds, 3), 'rows_per_sec': round(rows / seconds) if seconds else None}
+
+def benchmark_scoring(service, customers, latency_samples=LATENCY_SAMPLES):
+    """
+    Measures, for every model, batch throughput (customers/sec through
+    predict_batch) and single-customer latency (p50/p99 of predict_one).
+    """
+    X = _feature_matrix(service, customers)
+    sample = X[np.random.default_rng(42).integers(0, len(X), latency_samples)]
+    results = []
+    for model in service['models']:
+        start = time.perf_counter()
+        predict_batch(service, customers, model)
+        batch_seconds = time.perf_counter() - start
+
+        latencies = np.empty(len(sample))
+        for i, row in enumerate(sample):
+            start = time.perf_counter()
+            predict_one(service, row, model)
+            latencies[i] = (time.perf_counter() - start) * 1e6
+        results.append({
+            'model': model,
+            'batch_rows': len(X),
+            'batch_rows_per_sec': round(len(X) / batch_seconds),
+            'single_p50_us': round(float(np.percentile(latencies, 50)), 1),
+            'single_p99_us': round(float(np.percentile(latencies, 99)), 1),
+        })
+    results_df = pd.DataFrame(results)
+    print("\n--- Segment Scoring Throughput and Latency ---")
+    print(results_df.to_markdown(index=False))
+    return results_df
+
+
+if __name__ == '__main__':
+    scoring_service = load_classifiers()
+    if scoring_service is not None and os.path.exists(INPUT_FILE):
+        score_batch(scoring_service)
+        benchmark_scoring(scoring_service, read_table(INPUT_FILE))
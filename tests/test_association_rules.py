@@ -0,0 +1,81 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+from mlxtend.frequent_patterns import fpgrowth
+
+from create_tables import create_tables
+import association_rules
+
+
+def _build_warehouse(db_name, n_baskets=600, seed=7):
+    """
+    Loads random baskets into a fresh warehouse. The last three products are
+    bought together often, so there are frequent itemsets of every size up to 3,
+    while the first product is rare, so locally frequent items do not start at
+    column 0 in any partition.
+    """
+    create_tables(db_name)
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(db_name)
+    dates = pd.date_range('2011-01-01', '2011-12-31', freq='D')
+    conn.executemany("INSERT INTO TimeDim (date, day, month, quarter, year, is_weekend) VALUES (?, ?, ?, ?, ?, ?)",
+                     [(d.strftime('%Y-%m-%d'), d.day, d.month, d.quarter, d.year, int(d.dayofweek >= 5)) for d in dates])
+    countries = ['United Kingdom', 'France', 'Germany', 'Spain']
+    conn.executemany("INSERT INTO CustomerDim (cust_raw_id, country) VALUES (?, ?)",
+                     [(12000 + i, countries[i % len(countries)]) for i in range(40)])
+    conn.executemany("INSERT INTO ProductDim (stock_code, product_name) VALUES (?, ?)",
+                     [(f"P{i:03d}", f"Product {i}") for i in range(30)])
+    rows = []
+    for basket in range(n_baskets):
+        customer_id = int(rng.integers(1, 41))
+        time_id = int(rng.integers(1, len(dates) + 1))
+        items = set(rng.choice(np.arange(2, 31), size=int(rng.integers(1, 6)), replace=False))
+        if rng.random() < 0.3:
+            items |= {28, 29, 30}
+        if basket % 100 == 0:
+            items.add(1)
+        rows.extend((f"INV{basket:05d}", int(item), customer_id, time_id, 1, 1.0, 1.0) for item in items)
+    conn.executemany("INSERT INTO SalesFact (invoice_no, product_id, customer_id, time_id, quantity, unit_price, sales_amount) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture(scope='module')
+def warehouse(tmp_path_factory):
+    db_name = str(tmp_path_factory.mktemp('dw') / 'retail_dw.db')
+    _build_warehouse(db_name)
+    return db_name
+
+
+@pytest.mark.parametrize('partition_by', ['month', 'country'])
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_son_itemsets_equal_single_fpgrowth(warehouse, partition_by, n_jobs):
+    conn = sqlite3.connect(warehouse)
+    matrix, item_labels, partitions = association_rules.load_partitioned_baskets(conn, partition_by)
+    conn.close()
+    assert len(pd.unique(partitions)) > 1
+
+    son = association_rules.son_frequent_itemsets(matrix, item_labels, partitions,
+                                                  min_support=0.02, max_len=3, n_jobs=n_jobs)
+    full = fpgrowth(pd.DataFrame.sparse.from_spmatrix(matrix, columns=item_labels),
+                    min_support=0.02, use_colnames=True, max_len=3)
+
+    son_support = dict(zip(son['itemsets'], son['support']))
+    full_support = dict(zip(full['itemsets'], full['support']))
+    assert max(len(itemset) for itemset in full_support) == 3
+    assert son_support.keys() == full_support.keys()
+    for itemset, support in full_support.items():
+        assert son_support[itemset] == pytest.approx(support)
+
+
+def test_son_counts_candidates_across_blocks(warehouse, monkeypatch):
+    monkeypatch.setattr(association_rules, 'COUNT_BLOCK_ROWS', 7)
+    conn = sqlite3.connect(warehouse)
+    matrix, item_labels, partitions = association_rules.load_partitioned_baskets(conn, 'month')
+    conn.close()
+    son = association_rules.son_frequent_itemsets(matrix, item_labels, partitions, 0.02, 3, n_jobs=1)
+    full = fpgrowth(pd.DataFrame.sparse.from_spmatrix(matrix, columns=item_labels),
+                    min_support=0.02, use_colnames=True, max_len=3)
+    assert dict(zip(son['itemsets'], son['support'])) == pytest.approx(dict(zip(full['itemsets'], full['support'])))
@@ -0,0 +1,48 @@
+import sqlite3
+
+from create_tables import create_tables, deduplicate_dimensions
+
+
+def _legacy_warehouse(db_name):
+    """
+    A warehouse loaded before the natural keys were unique: every dimension has a
+    duplicated member and facts point at both copies.
+    """
+    conn = sqlite3.connect(db_name)
+    conn.execute("CREATE TABLE CustomerDim (customer_id INTEGER PRIMARY KEY AUTOINCREMENT, cust_raw_id INTEGER, name TEXT, "
+                 "gender TEXT, age INTEGER, country TEXT, city TEXT, segment TEXT);")
+    conn.execute("CREATE TABLE ProductDim (product_id INTEGER PRIMARY KEY AUTOINCREMENT, stock_code TEXT, product_name TEXT, "
+                 "category TEXT, brand TEXT, unit_price REAL);")
+    conn.execute("CREATE TABLE TimeDim (time_id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT, day INTEGER, month INTEGER, "
+                 "quarter INTEGER, year INTEGER, is_weekend INTEGER);")
+    conn.execute("CREATE TABLE SalesFact (sales_id INTEGER PRIMARY KEY AUTOINCREMENT, invoice_no TEXT, product_id INTEGER, "
+                 "customer_id INTEGER, time_id INTEGER, quantity INTEGER, unit_price REAL, sales_amount REAL, country TEXT);")
+    conn.executemany("INSERT INTO CustomerDim (cust_raw_id, country) VALUES (?, ?)", [(100, 'France'), (200, 'Spain'), (100, 'France')])
+    conn.executemany("INSERT INTO ProductDim (stock_code) VALUES (?)", [('A',), ('B',), ('A',)])
+    conn.executemany("INSERT INTO TimeDim (date, day, month, quarter, year) VALUES (?, ?, ?, ?, ?)",
+                     [('2011-01-01', 1, 1, 1, 2011), ('2011-01-01', 1, 1, 1, 2011), ('2011-02-01', 1, 2, 1, 2011)])
+    conn.executemany("INSERT INTO SalesFact (invoice_no, product_id, customer_id, time_id, quantity, sales_amount) VALUES (?, ?, ?, ?, ?, ?)",
+                     [('1', 1, 1, 1, 1, 10.0), ('2', 3, 3, 2, 2, 20.0), ('3', 2, 2, 3, 3, 30.0)])
+    conn.commit()
+    conn.close()
+
+
+def test_create_tables_merges_duplicate_members(tmp_path):
+    db_name = str(tmp_path / 'retail_dw.db')
+    _legacy_warehouse(db_name)
+
+    create_tables(db_name)
+
+    conn = sqlite3.connect(db_name)
+    assert conn.execute("SELECT COUNT(*) FROM CustomerDim").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM ProductDim").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM TimeDim").fetchone()[0] == 2
+    # Facts point at the surviving (highest) surrogate key of each natural key
+    assert conn.execute("SELECT product_id, customer_id, time_id FROM SalesFact ORDER BY sales_id").fetchall() == \
+        [(3, 3, 2), (3, 3, 2), (2, 2, 3)]
+    assert conn.execute("SELECT country, total_sales, row_count FROM AggSalesCountryQuarter ORDER BY country").fetchall() == \
+        [('France', 30.0, 2), ('Spain', 30.0, 1)]
+    assert conn.execute("SELECT customer_id, invoice_count, monetary FROM CustomerRFM ORDER BY customer_id").fetchall() == \
+        [(2, 1, 30.0), (3, 2, 30.0)]
+    assert deduplicate_dimensions(conn) == {'TimeDim': 0, 'CustomerDim': 0, 'ProductDim': 0}
+    conn.close()
@@ -0,0 +1,33 @@
+import sqlite3
+
+from create_tables import create_tables, get_load_version
+import dimension_key_cache
+
+
+def _add_members(conn, day, raw_id, stock_code):
+    conn.execute("INSERT INTO TimeDim (date) VALUES (?)", (day,))
+    conn.execute("INSERT INTO CustomerDim (cust_raw_id) VALUES (?)", (raw_id,))
+    conn.execute("INSERT INTO ProductDim (stock_code) VALUES (?)", (stock_code,))
+
+
+def test_cache_is_rebuilt_when_dimensions_change_under_the_same_load_version(tmp_path):
+    db_name = str(tmp_path / 'retail_dw.db')
+    cache_file = dimension_key_cache.key_cache_path(db_name)
+    create_tables(db_name)
+    conn = sqlite3.connect(db_name)
+    _add_members(conn, '2011-01-01', 100, 'A')
+    conn.execute("INSERT INTO EtlLoadLog (loaded_at, high_water_mark, rows_loaded) VALUES ('2011-01-02T00:00:00', '2011-01-01', 1)")
+    conn.commit()
+    dimension_key_cache.save_key_cache(dimension_key_cache.build_key_cache(conn), cache_file, get_load_version(conn))
+
+    # Unchanged warehouse: the saved cache is used
+    cached = dimension_key_cache.load_key_cache(conn, cache_file)
+    assert list(cached['ProductDim'][0]) == ['A']
+
+    # A rebuilt warehouse with the same load version (e.g. reloaded within the same second)
+    _add_members(conn, '2011-01-02', 200, 'B')
+    conn.commit()
+    rebuilt = dimension_key_cache.load_key_cache(conn, cache_file)
+    assert list(rebuilt['ProductDim'][0]) == ['A', 'B']
+    assert list(dimension_key_cache.resolve_surrogate_keys(rebuilt, 'CustomerDim', [200])) == [2]
+    conn.close()
@@ -0,0 +1,15 @@
+import numpy as np
+import pytest
+
+import etl_process
+
+
+def test_stage_peak_rss_excludes_earlier_stages():
+    if not etl_process._reset_peak_rss() or etl_process._stage_peak_rss_mb() is None:
+        pytest.skip('per-stage peak RSS needs Linux /proc')
+    block = np.ones(64 * 1024 * 1024 // 8)  # 64 MB, touched
+    del block
+    earlier_peak = etl_process._stage_peak_rss_mb()
+
+    assert etl_process._reset_peak_rss()
+    assert etl_process._stage_peak_rss_mb() < earlier_peak - 32
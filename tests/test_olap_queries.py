@@ -0,0 +1,92 @@
+import sqlite3
+import pytest
+import pandas as pd
+
+from create_tables import create_tables, create_analytical_indexes, has_product_search
+import columnar_backend
+import olap_queries
+from olap_aggregates import refresh_aggregates, rebuild_aggregates, aggregates_ready
+
+pytest.importorskip('duckdb')
+
+
+def _warehouse(db_name, sales_amount, aggregates=True):
+    """
+    A one-sale warehouse; every warehouse built here has the same load version.
+    """
+    create_tables(db_name)
+    conn = sqlite3.connect(db_name)
+    conn.execute("INSERT INTO TimeDim (date, day, month, quarter, year, is_weekend) VALUES ('2011-01-03', 3, 1, 1, 2011, 0)")
+    conn.execute("INSERT INTO CustomerDim (cust_raw_id, country) VALUES (12000, 'France')")
+    conn.execute("INSERT INTO ProductDim (stock_code, product_name) VALUES ('A1', 'SET OF CUPS')")
+    conn.execute("INSERT INTO SalesFact (invoice_no, product_id, customer_id, time_id, quantity, unit_price, sales_amount) "
+                 "VALUES ('1', 1, 1, 1, 1, ?, ?)", (sales_amount, sales_amount))
+    if aggregates:
+        refresh_aggregates(conn)
+    conn.execute("INSERT INTO EtlLoadLog (loaded_at, high_water_mark, rows_loaded) VALUES ('2011-01-04T00:00:00', '2011-01-03', 1)")
+    conn.commit()
+    conn.close()
+
+
+def test_duckdb_cache_is_kept_per_export(tmp_path):
+    olap_queries.clear_query_cache()
+    query = olap_queries.make_query(['country'], ['total_sales'], order_by='total_sales DESC')
+    totals = []
+    for sales_amount in (10.0, 99.0):
+        db_name = str(tmp_path / f"dw_{int(sales_amount)}.db")
+        parquet_dir = str(tmp_path / f"dw_{int(sales_amount)}_parquet")
+        _warehouse(db_name, sales_amount)
+        columnar_backend.export_star_schema(db_name, parquet_dir)
+        conn = columnar_backend.connect('duckdb', parquet_dir=parquet_dir)
+        assert columnar_backend.source_path(conn) == str((tmp_path / f"dw_{int(sales_amount)}_parquet").resolve())
+        totals.append(olap_queries.run_query(conn, query)['total_sales'].iloc[0])
+        conn.close()
+    assert totals == [10.0, 99.0]
+    assert olap_queries.query_cache_info()['hits'] == 0
+
+
+def test_empty_aggregates_fall_back_to_star_schema(tmp_path):
+    olap_queries.clear_query_cache()
+    db_name = str(tmp_path / "dw.db")
+    _warehouse(db_name, 10.0, aggregates=False)
+    conn = sqlite3.connect(db_name)
+    result = olap_queries.run_query(conn, olap_queries.make_query(['country'], ['total_sales']), use_cache=False)
+    assert result['total_sales'].tolist() == [10.0]
+
+    rebuild_aggregates(db_name)
+    assert aggregates_ready(conn)
+    conn.close()
+
+
+def test_product_search_matches_terms_with_query_syntax(tmp_path):
+    db_name = str(tmp_path / "dw.db")
+    _warehouse(db_name, 10.0)
+    create_analytical_indexes(db_name)
+    conn = sqlite3.connect(db_name)
+    assert has_product_search(conn)
+    conn.executemany("INSERT INTO ProductDim (stock_code, product_name) VALUES (?, ?)",
+                     [('B2', 'WHITE T-LIGHT HOLDER'), ('C3', "O'BRIEN \"LUCKY\" MUG")])
+    assert olap_queries.matching_product_ids(conn, 'T-LIGHT') == [2]
+    assert olap_queries.matching_product_ids(conn, "O'BRIEN") == [3]
+    assert olap_queries.matching_product_ids(conn, '"LUCKY"') == [3]
+    conn.close()
+
+
+def test_duckdb_rfm_reexports_stale_parquet(tmp_path):
+    from rfm_feature_engineering import calculate_rfm
+    db_name, parquet_dir = str(tmp_path / "dw.db"), str(tmp_path / "dw_parquet")
+    _warehouse(db_name, 10.0)
+    columnar_backend.export_star_schema(db_name, parquet_dir)
+
+    # A second load after the export
+    conn = sqlite3.connect(db_name)
+    conn.execute("INSERT INTO SalesFact (invoice_no, product_id, customer_id, time_id, quantity, unit_price, sales_amount) "
+                 "VALUES ('2', 1, 1, 1, 1, 5.0, 5.0)")
+    conn.execute("INSERT INTO EtlLoadLog (loaded_at, high_water_mark, rows_loaded) VALUES ('2011-01-05T00:00:00', '2011-01-03', 1)")
+    conn.commit()
+    conn.close()
+
+    output_file = str(tmp_path / "rfm.csv")
+    calculate_rfm(db_name, output_file, backend='duckdb', parquet_dir=parquet_dir)
+    rfm = pd.read_csv(output_file)
+    assert rfm[['frequency', 'monetary']].values.tolist() == [[2, 15.0]]
@@ -0,0 +1,72 @@
+import os
+import threading
+import pytest
+
+import etl_process
+import pipeline
+import reporting
+
+
+def _stage(name, run, deps=(), outputs=()):
+    return {'run': run, 'deps': list(deps), 'inputs': [], 'outputs': list(outputs), 'params': [], 'code': []}
+
+
+def _write_output():
+    with open('independent.txt', 'w') as f:
+        f.write('done')
+
+
+def _fail_after_scheduling_a_plot():
+    reporting.render(reporting.line_plot, 'unused.png', [1, 2], [1, 2], 'title', 'x', 'y')
+    raise RuntimeError('stage failed')
+
+
+def _never_runs():
+    raise AssertionError('a stage downstream of a failure ran')
+
+
+def _run_with_deadline(seconds, **kwargs):
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(summary=pipeline.run_pipeline(**kwargs)), daemon=True)
+    worker.start()
+    worker.join(seconds)
+    assert not worker.is_alive(), 'run_pipeline did not return'
+    return result['summary'].set_index('stage')['status'].to_dict()
+
+
+def test_failing_stage_in_worker_is_reported(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(reporting, 'RENDER_WORKERS', 1)
+    monkeypatch.setattr(pipeline, 'STAGES', {
+        'broken': _stage('broken', _fail_after_scheduling_a_plot),
+        'downstream': _stage('downstream', _never_runs, deps=['broken']),
+        'independent': _stage('independent', _write_output, outputs=['independent.txt']),
+    })
+
+    status = _run_with_deadline(60, max_workers=2, state_file='state.json')
+
+    assert status == {'broken': 'failed', 'downstream': 'blocked', 'independent': 'ran'}
+
+
+def test_missing_etl_source_fails_the_load(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pipeline, 'DB_NAME', str(tmp_path / 'retail_dw.db'))
+    monkeypatch.setattr(etl_process, 'DATA_FILE', str(tmp_path / 'missing.xlsx'))
+
+    summary = pipeline.run_pipeline(targets=['rfm_features'], max_workers=1, state_file='state.json')
+
+    status = summary.set_index('stage')['status'].to_dict()
+    assert status == {'create_tables': 'ran', 'etl': 'failed', 'rfm_features': 'blocked'}
+    assert pipeline.artifact_fingerprint(pipeline.DB_DATA, {}) is None
+
+
+@pytest.mark.parametrize('stage, module', [
+    ('etl', 'dimension_key_cache.py'),
+    ('etl', 'olap_aggregates.py'),
+    ('etl', 'rfm_feature_store.py'),
+    ('rfm_features', 'artifact_io.py'),
+    ('profiling', 'reporting.py'),
+])
+def test_stage_code_includes_imported_modules(stage, module):
+    files = [os.path.basename(path) for path in pipeline.code_files(pipeline.STAGES[stage]['code'])]
+    assert module in files
@@ -0,0 +1,44 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+import reporting
+import rfm_segment_profiling
+from artifact_io import write_table
+
+
+def _fail_plot():
+    raise RuntimeError('plot failed')
+
+
+def test_wait_for_plots_shuts_pool_down_on_failure(monkeypatch):
+    monkeypatch.setattr(reporting, 'PLOTS_ENABLED', True)
+    monkeypatch.setattr(reporting, 'RENDER_WORKERS', 1)
+    reporting.render(_fail_plot)
+    with pytest.raises(RuntimeError):
+        reporting.wait_for_plots()
+    assert reporting._pool is None
+    assert reporting._pending == []
+
+
+def test_profiling_with_custom_percentiles(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(reporting, 'RENDER_WORKERS', 0)
+    monkeypatch.setattr(rfm_segment_profiling, 'PROFILE_PERCENTILES', [0.1, 0.9])
+    rng = np.random.default_rng(0)
+    customers = pd.DataFrame({
+        'customer_id': np.arange(300),
+        'recency': rng.integers(1, 365, 300),
+        'frequency': rng.integers(1, 40, 300),
+        'monetary': rng.gamma(2.0, 500.0, 300),
+        'Cluster': np.arange(300) % 3,
+    })
+    write_table(customers, 'clusters.feather')
+
+    rfm_segment_profiling.profile_segments('clusters.feather', 'profiles.csv', 'names.json')
+
+    profiles = pd.read_csv('profiles.csv')
+    for column in ['recency_p10', 'recency_p90'] + [reporting.quantile_column('recency', q) for q in reporting.BOX_PERCENTILES]:
+        assert column in profiles.columns
+    assert os.path.exists('rfm_segment_boxplots.png')
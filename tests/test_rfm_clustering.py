@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from rfm_clustering import perform_clustering
+from rfm_segment_model import load_segment_model
+
+
+def _features(path, n_blobs=5, per_blob=200):
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(1, 8, size=(n_blobs, 3))
+    logs = np.vstack([center + rng.normal(scale=0.15, size=(per_blob, 3)) for center in centers])
+    values = np.exp(logs)
+    pd.DataFrame({'customer_id': np.arange(len(values)), 'recency': values[:, 0],
+                  'frequency': values[:, 1], 'monetary': values[:, 2]}).to_csv(path, index=False)
+
+
+def _cluster(tmp_path, **kwargs):
+    perform_clustering(str(tmp_path / 'rfm.csv'), str(tmp_path / 'scaled.csv'), str(tmp_path / 'clusters.csv'),
+                       n_jobs=1, model_file=str(tmp_path / 'model.npz'), **kwargs)
+    return pd.read_csv(tmp_path / 'clusters.csv')['Cluster'].nunique()
+
+
+def test_auto_refit_follows_new_selection_settings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the elbow plot is written to the working directory
+    _features(tmp_path / 'rfm.csv')
+    assert _cluster(tmp_path, k_range=range(1, 16)) > 2
+    assert _cluster(tmp_path, k_range=range(1, 16)) > 2  # reused: same settings, no drift
+
+    # Same data, no drift: a narrower k_range must still refit instead of reusing the saved K
+    assert _cluster(tmp_path, k_range=range(2, 3)) == 2
+    assert len(load_segment_model(str(tmp_path / 'model.npz'))['centroids']) == 2
+
+    # A different selection method refits as well and is recorded in the model
+    _cluster(tmp_path, k_range=range(2, 3), selection_method='silhouette')
+    assert load_segment_model(str(tmp_path / 'model.npz'))['selection_method'] == 'silhouette'
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+import rfm_k_selection
+
+
+def _customers(seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, 4, size=(5, 3))
+    return np.vstack([center + rng.normal(0, 1.0, size=(300, 3)) for center in centers])
+
+
+@pytest.mark.parametrize('method', ['kneedle', 'silhouette'])
+def test_selected_k_does_not_depend_on_n_jobs(method):
+    X = _customers()
+    results = [rfm_k_selection.select_k(X, k_range=range(1, 16), n_jobs=n_jobs, method=method)
+               for n_jobs in (1, 2, 4, 16)]
+    ks = {optimal_k for optimal_k, _, _ in results}
+    ranges = {tuple(sorted(sse)) for _, sse, _ in results}
+    assert len(ks) == 1
+    assert len(ranges) == 1
+    assert max(next(iter(ranges))) < 15  # the sweep stopped early